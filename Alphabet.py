@@ -0,0 +1,236 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Hashable, Iterable
+from dataclasses import dataclass
+
+MAX_CODE_POINT = 0x10FFFF
+# the code points are looked up in blocks of 2 ** BLOCK_BITS
+BLOCK_BITS = 8
+BLOCK_MASK = (1 << BLOCK_BITS) - 1
+# the most characters a ClassMap remembers
+MEMO_LIMIT = 4096
+
+
+@dataclass(frozen=True)
+class CharSet:
+    # a set of characters, as sorted, disjoint and non adjacent
+    # ranges of code points (both ends included)
+    intervals: tuple[tuple[int, int], ...]
+
+    @staticmethod
+    def of(intervals: Iterable[tuple[int, int]]) -> 'CharSet':
+        # sort the ranges and merge the ones that overlap or touch
+        merged = []
+        for low, high in sorted(intervals):
+            if merged and low <= merged[-1][1] + 1:
+                if high > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], high)
+            else:
+                merged.append((low, high))
+        return CharSet(tuple(merged))
+
+    @staticmethod
+    def parse(text: str) -> 'CharSet':
+        # text is a whole class: '[a-zA-Z_0-9]', or '[^...]' for the characters that
+        # are not in the class. a backslash takes the next character as it is, and
+        # a '-' that is first or last is a character, not a range
+        body = text[1:-1]
+        negated = body.startswith('^')
+        if negated:
+            body = body[1:]
+        # (character, escaped) pairs
+        characters = []
+        index = 0
+        while index < len(body):
+            escaped = body[index] == '\\' and index + 1 < len(body)
+            if escaped:
+                index += 1
+            characters.append((body[index], escaped))
+            index += 1
+        intervals = []
+        index = 0
+        while index < len(characters):
+            (character, _) = characters[index]
+            if (index + 2 < len(characters) and characters[index + 1] == ('-', False)):
+                intervals.append((ord(character), ord(characters[index + 2][0])))
+                index += 3
+            else:
+                intervals.append((ord(character), ord(character)))
+                index += 1
+        charset = CharSet.of(intervals)
+        return charset.negate() if negated else charset
+
+    def negate(self) -> 'CharSet':
+        intervals = []
+        low = 0
+        for start, end in self.intervals:
+            if start > low:
+                intervals.append((low, start - 1))
+            low = end + 1
+        if low <= MAX_CODE_POINT:
+            intervals.append((low, MAX_CODE_POINT))
+        return CharSet(tuple(intervals))
+
+    def __contains__(self, symbol: str) -> bool:
+        code = ord(symbol)
+        index = bisect_right(self.intervals, (code, MAX_CODE_POINT + 1)) - 1
+        return index >= 0 and self.intervals[index][1] >= code
+
+    def __str__(self) -> str:
+        # the class in the syntax of parse, so CharSet.parse(str(charset)) == charset
+        def escape(code: int) -> str:
+            return ('\\' if chr(code) in '\\]^-' else '') + chr(code)
+        return '[' + ''.join(escape(low) if low == high else f'{escape(low)}-{escape(high)}'
+                             for low, high in self.intervals) + ']'
+
+
+def label_intervals(label: str | CharSet) -> tuple[tuple[int, int], ...]:
+    # the code points of a transition label: a character or a CharSet
+    if isinstance(label, CharSet):
+        return label.intervals
+    return ((ord(label), ord(label)),)
+
+
+@dataclass
+class Alphabet:
+    # the characters are split into classes of characters that behave the same way in
+    # every transition, so automata only need one column for each class.
+    # the code points are cut into elementary ranges: range i starts at starts[i] and ends
+    # right before starts[i + 1], and all its characters are in the class interval_classes[i]
+    # (-1 for the characters that are not in the alphabet). the class ids are 0..size-1
+    starts: list[int]
+    interval_classes: list[int]
+    size: int
+
+    @staticmethod
+    def partition(transitions: Iterable[tuple[str | CharSet, Hashable]],
+                  labels: Iterable[str | CharSet]) -> 'Alphabet':
+        # transitions are (label, signature) pairs: two characters end up in the same class
+        # when they are in the labels of exactly the same signatures. labels are all the
+        # labels of the alphabet, including the ones that have no transitions
+        intervals = {label: label_intervals(label) for label in labels}
+        starts = sorted({point
+                         for label_ranges in intervals.values()
+                         for low, high in label_ranges
+                         for point in (low, high + 1)})
+        covered = [False] * len(starts)
+        signatures = [set() for _ in starts]
+        for label_ranges in intervals.values():
+            for low, high in label_ranges:
+                for index in range(bisect_left(starts, low), bisect_left(starts, high + 1)):
+                    covered[index] = True
+        for label, signature in transitions:
+            for low, high in intervals[label]:
+                for index in range(bisect_left(starts, low), bisect_left(starts, high + 1)):
+                    signatures[index].add(signature)
+        classes = {}
+        interval_classes = []
+        for index in range(len(starts)):
+            if covered[index]:
+                interval_classes.append(classes.setdefault(frozenset(signatures[index]), len(classes)))
+            else:
+                interval_classes.append(-1)
+        return Alphabet(starts, interval_classes, len(classes))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def class_of(self, symbol: str) -> int:
+        # the class of the character, -1 if it is not in the alphabet
+        index = bisect_right(self.starts, ord(symbol)) - 1
+        if index < 0:
+            return -1
+        return self.interval_classes[index]
+
+    def classes_of(self, label: str | CharSet) -> list[int]:
+        # the classes of all the characters of a transition label
+        classes = []
+        for low, high in label_intervals(label):
+            for index in range(bisect_right(self.starts, low) - 1, bisect_left(self.starts, high + 1)):
+                if index >= 0 and self.interval_classes[index] >= 0:
+                    classes.append(self.interval_classes[index])
+        return sorted(set(classes))
+
+    @property
+    def members(self) -> list[CharSet]:
+        # the characters of every class
+        intervals = [[] for _ in range(self.size)]
+        for index, class_id in enumerate(self.interval_classes):
+            if class_id >= 0:
+                intervals[class_id].append((self.starts[index], self.starts[index + 1] - 1))
+        return [CharSet.of(class_intervals) for class_intervals in intervals]
+
+    def table(self, columns: list[int] | None = None) -> 'ClassTable':
+        # the two-level table of the classes, or of columns[class] when the columns
+        # of an automaton are not the class ids
+        values = self.interval_classes
+        if columns is not None:
+            values = [-1 if class_id < 0 else columns[class_id] for class_id in values]
+        block_size = BLOCK_MASK + 1
+        blocks = []
+        block_ids = {}
+
+        def block_id(block: array) -> int:
+            # the same blocks are shared
+            key = block.tobytes()
+            if key not in block_ids:
+                block_ids[key] = len(blocks)
+                blocks.append(block)
+            return block_ids[key]
+
+        # the elementary ranges, with the characters before the first one and after the last one
+        bounds = [0] + self.starts + [MAX_CODE_POINT + 1]
+        range_values = [-1] + values[:-1] + [-1]
+        index = array('H', [block_id(array('i', [-1]) * block_size)]) * ((MAX_CODE_POINT >> BLOCK_BITS) + 1)
+        for low, high, value in zip(bounds, bounds[1:], range_values):
+            # the blocks that are all in the range
+            first_block = -(-low // block_size)
+            last_block = high // block_size
+            if first_block < last_block and value >= 0:
+                index[first_block:last_block] = array('H', [block_id(array('i', [value]) * block_size)]) * \
+                    (last_block - first_block)
+        # the blocks split between ranges
+        for block in sorted({start >> BLOCK_BITS for start in self.starts if start & BLOCK_MASK}):
+            block_start = block << BLOCK_BITS
+            values_block = array('i', [-1]) * block_size
+            for interval in range(bisect_right(bounds, block_start) - 1, bisect_left(bounds, block_start + block_size)):
+                if range_values[interval] >= 0:
+                    low = max(bounds[interval], block_start) - block_start
+                    high = min(bounds[interval + 1], block_start + block_size) - block_start
+                    values_block[low:high] = array('i', [range_values[interval]]) * (high - low)
+            index[block] = block_id(values_block)
+        return ClassTable(index, blocks)
+
+    def lookup(self, columns: list[int] | None = None) -> 'ClassMap':
+        # a map from the characters to their class, or to columns[class] when the columns
+        # of a table are not the class ids
+        return ClassMap(self.table(columns).class_of)
+
+
+@dataclass
+class ClassTable:
+    # the class of every code point in two steps: the block of the code point is
+    # blocks[index[code >> BLOCK_BITS]], and its class is block[code & BLOCK_MASK].
+    # the blocks that are the same (most of them are a single class or -1) are shared,
+    # so the table stays small even when the classes cover all of unicode
+    index: array
+    blocks: list[array]
+
+    def class_of(self, symbol: str) -> int:
+        code = ord(symbol)
+        return self.blocks[self.index[code >> BLOCK_BITS]][code & BLOCK_MASK]
+
+
+class ClassMap(dict):
+    # character -> class id (or -1), filled in the first time a character is looked up,
+    # so the inner loops mostly do a dictionary lookup. only the first MEMO_LIMIT
+    # characters are kept, the others are looked up every time
+    def __init__(self, lookup: Callable[[str], int]) -> None:
+        super().__init__()
+        self.lookup = lookup
+
+    def __missing__(self, symbol: str) -> int:
+        class_id = self.lookup(symbol)
+        if len(self) < MEMO_LIMIT:
+            self[symbol] = class_id
+        return class_id
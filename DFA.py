@@ -1,5 +1,10 @@
-from collections.abc import Callable
-from dataclasses import dataclass
+from array import array
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass, field
+
+from .Alphabet import Alphabet, ClassMap
+
+DEAD = 0  # the row of the dead state in every compiled table
 
 
 @dataclass
@@ -9,21 +14,186 @@ class DFA[STATE]:
     q0: STATE
     d: dict[tuple[STATE, str], STATE]
     F: set[STATE]
+    # for automata built from another one (e.g. by subset construction), the set of
+    # states of the original automaton that each state stands for
+    subsets: dict[STATE, frozenset] | None = field(default=None, repr=False, compare=False)
+    # when it is set, the symbols of the DFA are the class ids of this alphabet
+    alphabet: Alphabet | None = field(default=None, repr=False, compare=False)
     
+    # the compiled table, filled in by the first call of compile
+    compiled: 'DFATable[STATE] | None' = field(default=None, init=False, repr=False, compare=False)
+
     def accept(self, word: str) -> bool:
     # simulate the dfa on the given word. return True if the dfa accepts the word, False otherwise
-        current_state = self.q0
-        for symbol in word:
-            # check if the transition for the current symbol exists
-            if (current_state, symbol) in self.d:
-                next_state = self.d[(current_state, symbol)]
-                current_state = next_state
-            else:
-                # if the transition does not exist, the word is not accepted
-                return False
-        # check if the final state is reached
-        return current_state in self.F
+        # the simulation runs on the compiled table, so the transitions
+        # should not be changed afterwards without calling compile again
+        if self.compiled is None:
+            self.compile()
+        return self.compiled.accept(word)
+
+    def compile(self) -> 'DFATable[STATE]':
+        # build a dense transition table: one row for every state reachable from q0
+        # and one column for every symbol; the states from which no final state can
+        # be reached anymore are all merged into the dead state on row 0
+        symbols = sorted(self.S)
+        columns = {symbol: column for column, symbol in enumerate(symbols)}
+        width = len(symbols)
+        class_columns = None
+        if self.alphabet is None:
+            classes = ClassMap(lambda symbol: columns.get(symbol, -1))
+        else:
+            # the columns are the class ids, every character uses the column of its class
+            class_columns = [columns.get(class_id, -1) for class_id in range(len(self.alphabet))]
+            classes = self.alphabet.lookup(class_columns)
+
+        # find the live states going backwards from the final states
+        reverse = {}
+        for (state, _), next_state in self.d.items():
+            reverse.setdefault(next_state, []).append(state)
+        live = set(self.F)
+        stack = list(self.F)
+        while stack:
+            for previous_state in reverse.get(stack.pop(), ()):
+                if previous_state not in live:
+                    live.add(previous_state)
+                    stack.append(previous_state)
+
+        # number the live states in the order they are reached from q0
+        states = [None]
+        rows = {}
+        if self.q0 in live:
+            rows[self.q0] = len(states)
+            states.append(self.q0)
+        table = [array('i', [DEAD]) * width]
+        index = 1
+        while index < len(states):
+            state = states[index]
+            row = array('i', [DEAD]) * width
+            for column, symbol in enumerate(symbols):
+                next_state = self.d.get((state, symbol))
+                if next_state not in live:
+                    continue
+                if next_state not in rows:
+                    rows[next_state] = len(states)
+                    states.append(next_state)
+                row[column] = rows[next_state]
+            table.append(row)
+            index += 1
+
+        final = bytearray(len(states))
+        for row_index in range(1, len(states)):
+            if states[row_index] in self.F:
+                final[row_index] = 1
+        self.compiled = DFATable(classes, width, table, rows.get(self.q0, DEAD), final, states,
+                                 self.alphabet, class_columns)
+        return self.compiled
+
+    def minimize(self, key: Callable[[STATE], Hashable] | None = None) -> 'DFA[int]':
+        # Hopcroft's partition refinement. the states reachable from q0 start split into
+        # blocks by key (by default: final or not) and a block is split every time
+        # some of its states go into a splitter block on a symbol and the others do not.
+        # the resulting DFA has a state for each block and keeps the block in subsets
+        # the extra sink state for missing transitions is not final; with a custom key
+        # there is no label for it, so it starts in a block of its own
+        sink_label = None
+        if key is None:
+            key = lambda state: state in self.F
+            sink_label = (False,)
+        symbols = sorted(self.S)
+        width = len(symbols)
+
+        # number the reachable states; missing transitions go to an extra sink state
+        states = [self.q0]
+        ids = {self.q0: 0}
+        delta = []
+        sink = None
+        index = 0
+        while index < len(states):
+            row = []
+            for symbol in symbols:
+                if states[index] is not sink and (states[index], symbol) in self.d:
+                    next_state = self.d[(states[index], symbol)]
+                else:
+                    if sink is None:
+                        sink = object()
+                        ids[sink] = len(states)
+                        states.append(sink)
+                    next_state = sink
+                if next_state not in ids:
+                    ids[next_state] = len(states)
+                    states.append(next_state)
+                row.append(ids[next_state])
+            delta.append(row)
+            index += 1
+        inverse = [[[] for _ in states] for _ in range(width)]
+        for state, row in enumerate(delta):
+            for column, next_state in enumerate(row):
+                inverse[column][next_state].append(state)
 
+        # the initial partition
+        groups = {}
+        for state, label in enumerate(states):
+            groups.setdefault(sink_label if label is sink else (key(label),), []).append(state)
+        blocks = [set(group) for group in groups.values()]
+        block_of = [0] * len(states)
+        for block, members in enumerate(blocks):
+            for state in members:
+                block_of[state] = block
+        # all the blocks but the largest one have to be used as splitters
+        largest = max(range(len(blocks)), key=lambda block: len(blocks[block]))
+        waiting = {(block, column)
+                   for block in range(len(blocks)) if block != largest
+                   for column in range(width)}
+        waiting_list = list(waiting)
+
+        while waiting_list:
+            splitter = waiting_list.pop()
+            waiting.discard(splitter)
+            block, column = splitter
+            # the states that go into the splitter block on the symbol, grouped by their block
+            touched = {}
+            for next_state in blocks[block]:
+                for state in inverse[column][next_state]:
+                    touched.setdefault(block_of[state], set()).add(state)
+            for split_block, moved in touched.items():
+                if len(moved) == len(blocks[split_block]):
+                    continue
+                new_block = len(blocks)
+                blocks[split_block] -= moved
+                blocks.append(moved)
+                for state in moved:
+                    block_of[state] = new_block
+                for other_column in range(width):
+                    if (split_block, other_column) in waiting:
+                        splitter = (new_block, other_column)
+                    elif len(moved) <= len(blocks[split_block]):
+                        splitter = (new_block, other_column)
+                    else:
+                        splitter = (split_block, other_column)
+                    waiting.add(splitter)
+                    waiting_list.append(splitter)
+
+        # build the minimal DFA, numbering the blocks in the order they are reached from q0
+        new_ids = {block_of[0]: 0}
+        order = [block_of[0]]
+        new_dict = {}
+        final_states = set()
+        subsets = {}
+        index = 0
+        while index < len(order):
+            block = order[index]
+            representative = next(iter(blocks[block]))
+            for column, symbol in enumerate(symbols):
+                next_block = block_of[delta[representative][column]]
+                if next_block not in new_ids:
+                    new_ids[next_block] = len(order)
+                    order.append(next_block)
+                new_dict[(index, symbol)] = new_ids[next_block]
+            if states[representative] is not sink and states[representative] in self.F:
+                final_states.add(index)
+            subsets[index] = frozenset(states[state] for state in blocks[block] if states[state] is not sink)
+            index += 1
+        return DFA(set(self.S), set(range(len(order))), 0, new_dict, final_states, subsets, self.alphabet)
 
     def remap_states[OTHER_STATE](self, f: Callable[[STATE], 'OTHER_STATE']) -> 'DFA[OTHER_STATE]':
         # optional, but might be useful for subset construction and the lexer to avoid state name conflicts.
@@ -44,4 +214,72 @@ class DFA[STATE]:
         #                   /     ⬉
         #                   \-a,b-/
 
-        pass
+        # f is called only once for every state, the rest are dictionary lookups
+        states = set().union(self.K, self.F)
+        states.add(self.q0)
+        for (state, _), next_state in self.d.items():
+            states.add(state)
+            states.add(next_state)
+        new_names = {state: f(state) for state in states}
+        subsets = None
+        if self.subsets is not None:
+            subsets = {new_names[state]: subset for state, subset in self.subsets.items()}
+        return DFA(set(self.S),
+                   {new_names[state] for state in self.K},
+                   new_names[self.q0],
+                   {(new_names[state], symbol): new_names[next_state]
+                    for (state, symbol), next_state in self.d.items()},
+                   {new_names[state] for state in self.F},
+                   subsets,
+                   self.alphabet)
+
+    def renumber(self) -> 'DFA[int]':
+        # rename the states to 0..n-1, in the order they are reached from q0 (breadth first)
+        # with the unreachable states at the end
+        successors = {}
+        for (state, symbol), next_state in sorted(self.d.items(), key=lambda item: item[0][1]):
+            successors.setdefault(state, []).append(next_state)
+        order = {self.q0: 0}
+        queue = [self.q0]
+        index = 0
+        while index < len(queue):
+            for next_state in successors.get(queue[index], ()):
+                if next_state not in order:
+                    order[next_state] = len(order)
+                    queue.append(next_state)
+            index += 1
+        for state in self.K:
+            if state not in order:
+                order[state] = len(order)
+        return self.remap_states(order.__getitem__)
+
+
+@dataclass
+class DFATable[STATE]:
+    # character -> column of the table (-1 for the characters that are not in the alphabet)
+    classes: dict[str, int]
+    width: int
+    # table[state][column] -> next state, with the states numbered from 0 (DEAD)
+    table: list[array]
+    start: int
+    # final[state] is 1 for the final states
+    final: bytearray
+    # the DFA state behind each row (None for the dead state)
+    states: list[STATE | None]
+    # for a DFA over an alphabet, classes is alphabet.lookup(columns)
+    alphabet: Alphabet | None = field(default=None, repr=False)
+    columns: list[int] | None = field(default=None, repr=False)
+
+    def accept(self, word: str) -> bool:
+        classes = self.classes
+        table = self.table
+        state = self.start
+        for symbol in word:
+            column = classes[symbol]
+            if column < 0:
+                # the symbol is not in the alphabet
+                return False
+            state = table[state][column]
+            if state == DEAD:
+                return False
+        return self.final[state] == 1
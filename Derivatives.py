@@ -0,0 +1,252 @@
+from .Alphabet import Alphabet, CharSet
+from .DFA import DFA
+from .NFA import EPSILON
+from .Regex import Regex, Character, Concat, Union, Kleene, Plus, Optional, Repeat, Sugar
+
+# the kinds of terms
+EMPTY = 'empty'  # no word at all
+EMPTY_WORD = 'empty word'
+CHARS = 'chars'
+CAT = 'cat'
+OR = 'or'
+STAR = 'star'
+REPEAT = 'repeat'
+
+
+class Terms:
+    def __init__(self) -> None:
+        # the regexes used by the derivatives, hash-consed: every term is a tuple
+        # (kind, *operands) where the operands are the ids of other terms, and equal
+        # tuples get the same id. the constructors apply the similarity rules
+        # (unions are sets, concatenations are nested to the right, the empty
+        # word and the empty language are simplified away), so a regex only
+        # has a finite number of derivatives
+        self.terms = []
+        self.ids = {}
+        self.nullable = []
+        self.derivatives = {}
+        self.empty = self.term((EMPTY,), False)
+        self.empty_word = self.term((EMPTY_WORD,), True)
+
+    def term(self, term: tuple, nullable: bool) -> int:
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.ids[term] = term_id
+            self.terms.append(term)
+            self.nullable.append(nullable)
+        return term_id
+
+    def chars(self, label: str | CharSet) -> int:
+        if label == EPSILON:
+            return self.empty_word
+        if not isinstance(label, CharSet):
+            label = CharSet.of([(ord(label), ord(label))])
+        if not label.intervals:
+            return self.empty
+        return self.term((CHARS, label), False)
+
+    def cat(self, first: int, second: int) -> int:
+        if first == self.empty or second == self.empty:
+            return self.empty
+        if first == self.empty_word:
+            return second
+        if second == self.empty_word:
+            return first
+        # (a b) c = a (b c), without recursion since the parser nests long concatenations to the left
+        spine = []
+        while self.terms[first][0] == CAT:
+            spine.append(self.terms[first][1])
+            first = self.terms[first][2]
+        result = self.term((CAT, first, second), self.nullable[first] and self.nullable[second])
+        for operand in reversed(spine):
+            result = self.term((CAT, operand, result), self.nullable[operand] and self.nullable[result])
+        return result
+
+    def union(self, *operands: int) -> int:
+        members = set()
+        for operand in operands:
+            if self.terms[operand][0] == OR:
+                members.update(self.terms[operand][1])
+            elif operand != self.empty:
+                members.add(operand)
+        if not members:
+            return self.empty
+        if len(members) == 1:
+            return members.pop()
+        return self.term((OR, frozenset(members)), any(self.nullable[member] for member in members))
+
+    def star(self, operand: int) -> int:
+        if operand == self.empty or operand == self.empty_word:
+            return self.empty_word
+        if self.terms[operand][0] == STAR:
+            return operand
+        return self.term((STAR, operand), True)
+
+    def repeat(self, operand: int, minimum: int, maximum: int | None) -> int:
+        if maximum is None and minimum == 0:
+            return self.star(operand)
+        if maximum == 0 or operand == self.empty_word:
+            return self.empty_word
+        if operand == self.empty:
+            return self.empty_word if minimum == 0 else self.empty
+        if minimum == 1 and maximum == 1:
+            return operand
+        return self.term((REPEAT, operand, minimum, maximum), minimum == 0 or self.nullable[operand])
+
+    def from_regex(self, regex: Regex) -> int:
+        # the term of a regex, built in a single postfix pass like the nfas
+        operands_stack = []
+        for node in regex.postorder():
+            count = len(node.children())
+            operands = operands_stack[len(operands_stack) - count:]
+            del operands_stack[len(operands_stack) - count:]
+            match node:
+                case Character():
+                    operands_stack.append(self.chars(node.character))
+                case Sugar():
+                    operands_stack.append(self.chars(CharSet.parse(node.sugar)))
+                case Concat():
+                    operands_stack.append(self.cat(*operands))
+                case Union():
+                    operands_stack.append(self.union(*operands))
+                case Kleene():
+                    operands_stack.append(self.star(*operands))
+                case Plus():
+                    operands_stack.append(self.cat(operands[0], self.star(operands[0])))
+                case Optional():
+                    operands_stack.append(self.union(operands[0], self.empty_word))
+                case Repeat():
+                    operands_stack.append(self.repeat(operands[0], node.minimum, node.maximum))
+        return operands_stack.pop()
+
+    def labels(self, term_id: int) -> set[CharSet]:
+        # the character sets used by the term
+        labels = set()
+        stack = [term_id]
+        seen = {term_id}
+        while stack:
+            term = self.terms[stack.pop()]
+            kind = term[0]
+            if kind == CHARS:
+                labels.add(term[1])
+                operands = ()
+            elif kind == OR:
+                operands = term[1]
+            elif kind == CAT:
+                operands = term[1:]
+            elif kind in (STAR, REPEAT):
+                operands = term[1:2]
+            else:
+                operands = ()
+            for operand in operands:
+                if operand not in seen:
+                    seen.add(operand)
+                    stack.append(operand)
+        return labels
+
+    def derivative(self, term_id: int, symbol: str) -> int:
+        # the words w for which symbol + w is a word of the term. symbol stands for its
+        # whole class of characters, so the derivatives are cached by the class.
+        # the derivatives of the operands are found first, with a stack instead of recursion;
+        # the operands of a term are older than it, so the stack never goes round in a cycle
+        stack = [term_id]
+        while stack:
+            current = stack[-1]
+            if (current, symbol) in self.derivatives:
+                stack.pop()
+                continue
+            missing = [operand for operand in self.derived_operands(current)
+                       if (operand, symbol) not in self.derivatives]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            self.derivatives[(current, symbol)] = self.derive(current, symbol)
+        return self.derivatives[(term_id, symbol)]
+
+    def derived_operands(self, term_id: int) -> tuple[int, ...]:
+        # the operands whose derivatives are needed for the derivative of the term
+        term = self.terms[term_id]
+        kind = term[0]
+        if kind == CAT:
+            return term[1:] if self.nullable[term[1]] else term[1:2]
+        if kind == OR:
+            return tuple(term[1])
+        if kind in (STAR, REPEAT):
+            return term[1:2]
+        return ()
+
+    def derive(self, term_id: int, symbol: str) -> int:
+        # the derivative of the term, once the derivatives of its operands are cached
+        derivatives = self.derivatives
+        term = self.terms[term_id]
+        kind = term[0]
+        if kind == CHARS:
+            return self.empty_word if symbol in term[1] else self.empty
+        if kind == CAT:
+            (_, first, second) = term
+            result = self.cat(derivatives[(first, symbol)], second)
+            if self.nullable[first]:
+                result = self.union(result, derivatives[(second, symbol)])
+            return result
+        if kind == OR:
+            return self.union(*(derivatives[(member, symbol)] for member in term[1]))
+        if kind == STAR:
+            return self.cat(derivatives[(term[1], symbol)], term_id)
+        if kind == REPEAT:
+            (_, operand, minimum, maximum) = term
+            rest = self.repeat(operand, max(minimum - 1, 0), None if maximum is None else maximum - 1)
+            return self.cat(derivatives[(operand, symbol)], rest)
+        return self.empty
+
+
+def derivative_dfa(regexes: list[Regex]) -> DFA[int]:
+    """
+        Builds the DFA of a list of regexes with Brzozowski derivatives, without
+    any NFA. A state is the vector of the derivatives of all the regexes by the
+    word read so far (without the ones that match nothing); it is final when
+    one of them accepts the empty word, and its subset is the set of the
+    indexes of the regexes that accept it.
+    The symbols of the DFA are the classes of an alphabet in which every
+    class is inside or outside of every character set of the regexes
+    Args:
+        regexes: the regexes, in the order of their priority
+
+    Returns:
+        the DFA, with the state 0 for the vector of the regexes
+    """
+    terms = Terms()
+    # the vectors only keep the (index, derivative) pairs of the regexes that can still
+    # match something, most of the regexes of a spec are dropped after a few characters
+    start = tuple((rule, term_id) for rule, term_id in enumerate(terms.from_regex(regex) for regex in regexes)
+                  if term_id != terms.empty)
+    labels = set().union(*(terms.labels(term_id) for _, term_id in start))
+    alphabet = Alphabet.partition(((label, label) for label in labels), labels)
+    # one character stands for all the characters of its class
+    symbols = [chr(charset.intervals[0][0]) for charset in alphabet.members]
+
+    ids = {start: 0}
+    vectors = [start]
+    new_dict = {}
+    final_states = set()
+    subsets = {}
+    index = 0
+    while index < len(vectors):
+        vector = vectors[index]
+        accepting = frozenset(rule for rule, term_id in vector if terms.nullable[term_id])
+        subsets[index] = accepting
+        if accepting:
+            final_states.add(index)
+        for class_id, symbol in enumerate(symbols):
+            next_vector = tuple((rule, next_term)
+                                for rule, term_id in vector
+                                if (next_term := terms.derivative(term_id, symbol)) != terms.empty)
+            next_id = ids.get(next_vector)
+            if next_id is None:
+                next_id = len(vectors)
+                ids[next_vector] = next_id
+                vectors.append(next_vector)
+            new_dict[(index, class_id)] = next_id
+        index += 1
+    return DFA(set(range(len(symbols))), set(range(len(vectors))), 0, new_dict, final_states, subsets, alphabet)
@@ -0,0 +1,229 @@
+from array import array
+from collections.abc import Callable
+from itertools import chain
+
+from .Alphabet import Alphabet
+from .DFA import DEAD, DFA
+from .NFA import NFA, BitNFA, EPSILON
+
+UNKNOWN = -1  # a transition of the lazy dfa that has not been computed yet
+
+# the cache is thrashing when it fills up again after fewer than
+# this many characters for each of its states
+THRASH_RATIO = 10
+
+
+class LazyDFA:
+    def __init__(self, nfa: NFA, alphabet: Alphabet, token_id: Callable[[frozenset], int],
+                 max_states: int = 1000) -> None:
+        # a dfa built from the nfa by subset construction, one transition at a time, the first
+        # time the transition is needed. the rows have the same layout as a DFATable, with
+        # UNKNOWN for the transitions that are still to be computed, so the lexer can use
+        # the table directly and call step only when it hits an UNKNOWN.
+        # at most max_states states are kept; when there is no room left the whole cache is
+        # flushed, and if that happens too often the lazy dfa stops caching and simulates
+        # the nfa (on two scratch rows) until the next restart.
+        # token_id gives the token matched by a subset, kept for every row in token_ids
+        self.token_id = token_id
+        self.max_states = max(max_states, 4)
+        self.set_nfa(nfa, alphabet)
+        self.table = []
+        self.subsets = []
+        self.token_ids = []
+        self.ids = {}
+        self.simulating = False
+        # the position of the last flush in the current input, None before the first one
+        self.last_flush = None
+        self.flushes = 0
+        self.flush()
+
+    def set_nfa(self, nfa: NFA, alphabet: Alphabet) -> None:
+        self.nfa = nfa
+        self.alphabet = alphabet
+        self.classes = alphabet.lookup()
+        self.width = len(alphabet)
+        self.moves = {}
+        for (state, symbol), next_states in nfa.d.items():
+            if symbol != EPSILON:
+                for column in alphabet.classes_of(symbol):
+                    self.moves.setdefault(state, []).append((column, next_states))
+
+    def update(self, nfa: NFA, removed: set) -> None:
+        # the rules of the nfa were edited: the states of the rules that are kept did not change,
+        # removed are the states of the rules that are gone, and the start state has the moves
+        # of the new rules. a subset without removed states only goes into subsets without them,
+        # so its row stays right and is kept; the others are dropped and the row of the start
+        # state is computed again. the alphabet is refined instead of being built again, so every
+        # new class is inside an old one and the kept rows only need their columns copied.
+        # the characters of the removed rules stay in the alphabet, they just lead to DEAD
+        old_alphabet = self.alphabet
+        members = old_alphabet.members
+        alphabet = Alphabet.partition(
+            chain(((symbol, (state, frozenset(next_states)))
+                   for (state, symbol), next_states in nfa.d.items() if symbol != EPSILON),
+                  ((member, class_id) for class_id, member in enumerate(members))),
+            chain((symbol for symbol in nfa.S if symbol != EPSILON), members))
+        parents = [old_alphabet.class_of(chr(member.intervals[0][0])) for member in alphabet.members]
+        self.set_nfa(nfa, alphabet)
+        if self.simulating:
+            self.simulating = False
+            self.flush()
+            return
+        kept = [state for state, subset in enumerate(self.subsets)
+                if state == DEAD or state == self.start or subset.isdisjoint(removed)]
+        new_ids = {state: new_state for new_state, state in enumerate(kept)}
+        new_ids[UNKNOWN] = UNKNOWN
+        table = [array('i', [DEAD]) * self.width]
+        for state in kept[1:]:
+            row = self.table[state]
+            if state == self.start:
+                table.append(array('i', [UNKNOWN]) * self.width)
+            else:
+                table.append(array('i', [new_ids.get(row[parent], UNKNOWN) if parent >= 0 else UNKNOWN
+                                         for parent in parents]))
+        # the lists are changed in place, like in flush
+        self.subsets[:] = [self.subsets[state] for state in kept]
+        self.table[:] = table
+        # the priorities of the rules may have changed too
+        self.token_ids[:] = [self.token_id(subset) for subset in self.subsets]
+        self.ids.clear()
+        self.ids.update((subset, state) for state, subset in enumerate(self.subsets))
+        self.start = new_ids[self.start]
+
+    def complete(self) -> list[int]:
+        # computes all the transitions of the states reached from the start that are not known
+        # yet, whatever the size of the cache, so the rows hold the whole subset automaton.
+        # every row gets all its transitions in a single pass over its subset, like in
+        # NFA.subset_construction. returns the states reached, in the order they were found
+        order = [self.start]
+        seen = {self.start}
+        index = 0
+        while index < len(order):
+            state = order[index]
+            row = self.table[state]
+            if UNKNOWN in row:
+                targets = {}
+                for nfa_state in self.subsets[state]:
+                    for column, next_states in self.moves.get(nfa_state, ()):
+                        target = targets.setdefault(column, set())
+                        for next_state in next_states:
+                            target.update(self.nfa.epsilon_closure(next_state))
+                for column in range(self.width):
+                    if row[column] == UNKNOWN:
+                        subset = frozenset(targets.get(column, ()))
+                        next_state = self.ids.get(subset)
+                        row[column] = next_state if next_state is not None else self.add(subset)
+            for next_state in row:
+                if next_state not in seen:
+                    seen.add(next_state)
+                    order.append(next_state)
+            index += 1
+        return order
+
+    def dfa(self) -> DFA[int]:
+        # the subset automaton of the nfa over the classes of the alphabet, with the rows
+        # as its states and their subsets kept in subsets
+        order = self.complete()
+        table = self.table
+        return DFA(set(range(self.width)), set(order), self.start,
+                   {(state, column): table[state][column] for state in order for column in range(self.width)},
+                   {state for state in order if not self.nfa.F.isdisjoint(self.subsets[state])},
+                   {state: self.subsets[state] for state in order}, self.alphabet)
+
+    def flush(self) -> None:
+        # the lists are cleared in place, so the lexer can keep references to them
+        self.table.clear()
+        self.subsets.clear()
+        self.token_ids.clear()
+        self.ids.clear()
+        self.add(frozenset())
+        self.table[DEAD] = array('i', [DEAD]) * self.width
+        self.start = self.add(self.nfa.epsilon_closure(self.nfa.q0))
+
+    def add(self, subset: frozenset) -> int:
+        state = len(self.subsets)
+        self.ids[subset] = state
+        self.subsets.append(subset)
+        self.token_ids.append(self.token_id(subset))
+        self.table.append(array('i', [UNKNOWN]) * self.width)
+        return state
+
+    def restart(self) -> None:
+        # called at the beginning of every input
+        if self.simulating:
+            self.simulating = False
+            self.flush()
+        self.last_flush = None
+
+    def move(self, subset: frozenset, column: int) -> frozenset:
+        # the epsilon closure of the states reached from the subset with the symbol class
+        target = set()
+        for state in subset:
+            for symbol_class, next_states in self.moves.get(state, ()):
+                if symbol_class == column:
+                    for next_state in next_states:
+                        target.update(self.nfa.epsilon_closure(next_state))
+        return frozenset(target)
+
+    def step(self, state: int, column: int, index: int) -> int:
+        # compute the transition from state with the symbol class; index is the
+        # position in the input, used to find out if the cache is thrashing
+        subset = self.move(self.subsets[state], column)
+        if not subset:
+            next_state = DEAD
+        elif self.simulating:
+            # nothing is cached, the two scratch rows take turns holding the current subset
+            next_state = 3 if state == 2 else 2
+            self.subsets[next_state] = subset
+            self.token_ids[next_state] = self.token_id(subset)
+            return next_state
+        elif subset in self.ids:
+            next_state = self.ids[subset]
+        elif len(self.subsets) < self.max_states:
+            next_state = self.add(subset)
+        else:
+            # the cache is full: start over, keeping only the dead and the start state
+            self.flushes += 1
+            if self.last_flush is not None and index - self.last_flush < THRASH_RATIO * self.max_states:
+                self.simulating = True
+            self.last_flush = index
+            self.flush()
+            if self.simulating:
+                self.subsets.extend([frozenset(), subset])
+                self.token_ids.extend([-1, self.token_id(subset)])
+                self.table.extend(array('i', [UNKNOWN]) * self.width for _ in range(2))
+                return 3
+            # the row of state is gone, so the transition is not stored
+            return self.add(subset)
+        if not self.simulating:
+            self.table[state][column] = next_state
+        return next_state
+
+
+class NFASimulation:
+    def __init__(self, nfa: BitNFA, token_id: Callable[[frozenset], int]) -> None:
+        # runs the bit-parallel nfa with the same layout as LazyDFA: row 1 is the start
+        # state and the two scratch rows 2 and 3 take turns holding the current states,
+        # so every transition is computed by step and nothing is determinized
+        self.nfa = nfa
+        self.classes = nfa.classes
+        width = len(nfa.moves)
+        self.table = [array('i', [DEAD]) * width]
+        self.table.extend(array('i', [UNKNOWN]) * width for _ in range(3))
+        self.masks = [0, nfa.start, 0, 0]
+        # lex only needs the token matched by every row, found from its final states
+        self.token_id = token_id
+        self.token_ids = [-1, token_id(nfa.final_states(nfa.start)), -1, -1]
+        self.start = 1
+
+    def restart(self) -> None:
+        pass
+
+    def step(self, state: int, column: int, index: int) -> int:
+        mask = self.nfa.step(self.masks[state], column)
+        if not mask:
+            return DEAD
+        next_state = 3 if state == 2 else 2
+        self.masks[next_state] = mask
+        self.token_ids[next_state] = self.token_id(self.nfa.final_states(mask))
+        return next_state
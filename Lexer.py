@@ -1,33 +1,243 @@
-from .Regex import parse_regex
+from array import array
+
+from .RegexCache import CONSTRUCTIONS, regex_cache
 from .NFA import NFA
+from .DFA import DEAD, DFATable
+from .LazyDFA import LazyDFA, NFASimulation, UNKNOWN
+from .Derivatives import derivative_dfa
+from .LexerGenerator import module_source, write_module
+from .Regex import parse_regex
+
+# the automata lex can run on
+ENGINES = ('dfa', 'lazy', 'nfa', 'derivatives')
+
+
 class Lexer:
-    def __init__(self, spec: list[tuple[str, str]]) -> None:
+    def __init__(self, spec: list[tuple[str, str]], engine: str = 'dfa', cache_size: int = 1000,
+                 construction: str = 'thompson', workers: int = 1) -> None:
         # initialisation should convert the specification to a dfa which will be used in the lex method
         # the specification is a list of pairs (TOKEN_NAME:REGEX)
+        # the nfas of the regexes are built with the given construction: 'thompson', or 'glushkov'
+        # for nfas without epsilon transitions and with a state for every character of the regex.
+        # with more than one worker, the nfas of large specs are built by a pool of processes
+        # (see RegexCache.get_all). only that part of the build runs in parallel, so for most
+        # specs more workers are not faster, and they are slower when the pool is started
+        if construction not in CONSTRUCTIONS:
+            raise ValueError(f'unknown regex construction {construction}')
+        if engine not in ENGINES:
+            raise ValueError(f'unknown lexer engine {engine}')
+        self.engine = engine
+        self.cache_size = cache_size
+        self.construction = construction
+        self.workers = workers
+        # the nfa without epsilon transitions of every regex of the spec, numbered from 0.
+        # they are kept when the rules are edited, so only the new regexes are compiled
+        self.rule_nfas = {}
+        self.build(list(spec))
+
+    def build(self, spec: list[tuple[str, str]]) -> None:
+        # build the automaton that lex runs on for the spec, from scratch.
+        # every rule gets its own range of states, after the ranges of the previous rules
+        # (state 0 is q0). an edit gives the new rules new ranges, so the states of the
+        # other rules keep their numbers
+        self.rule_offsets = [None] * len(spec)
+        self.next_offset = 1
+        self.rows = None
+        if self.engine == 'derivatives':
+            # no nfa at all: the dfa is built from the regexes of the rules with derivatives,
+            # and the subset of a state is the set of the indexes of the rules it accepts
+            dfa = derivative_dfa([parse_regex(regex).simplify() for _, regex in spec])
+            self.set_spec(spec, [(frozenset([index]), name) for index, (name, _) in enumerate(spec)])
+            self.dfa = dfa
+            self.table = self.dfa.compile()
+            self.token_ids = array('i', [-1 if state is None else self.token_id(self.dfa.subsets[state])
+                                         for state in self.table.states])
+            return
+        self.load_rules(spec)
+        self.assemble(spec)
+        if self.engine == 'lazy':
+            # the dfa states are built by lex, the first time they are reached,
+            # and at most cache_size of them are kept
+            self.runner = LazyDFA(self.nfa, self.nfa.alphabet(), self.token_id, self.cache_size)
+            return
+        if self.engine == 'nfa':
+            # no dfa at all, lex simulates the nfa with bitmasks
+            self.runner = NFASimulation(self.nfa.compile(self.nfa.alphabet()), self.token_id)
+            return
+        # create the dfa over the classes of symbols that behave the same way. its rows are
+        # the rows of a lazy dfa that computes all of them, so they can be kept by the edits
+        self.rows = LazyDFA(self.nfa, self.nfa.alphabet(), self.token_id)
+        dfa = self.rows.dfa()
+        # minimize it, keeping apart the states that match different tokens
+        # so max munch and the priority of the rules are not changed
+        self.dfa = dfa.minimize(lambda state: self.token_id(dfa.subsets[state]))
+        # lex looks for the tokens in the nfa states of a dfa state; the merged states
+        # all have the same winning token, so any of them can stand for the new state
+        self.dfa.subsets = {state: dfa.subsets[min(block)] if block else frozenset()
+                            for state, block in self.dfa.subsets.items()}
+        self.compile()
+
+    def compile(self) -> None:
+        # the lexer runs on the dense table of the dfa
+        self.table = self.dfa.compile()
+        # the token matched in each row of the table, so lex does not look at the nfa states
+        self.token_ids = array('i', [-1 if state is None else self.token_id(self.dfa.subsets[state])
+                                     for state in self.table.states])
+
+    def load_rules(self, spec: list[tuple[str, str]]) -> None:
+        # the nfa of a regex is compiled and reduced only once, lexers with the same regexes share it
+        missing = [regex for _, regex in spec if regex not in self.rule_nfas]
+        for regex, nfa in zip(missing, regex_cache.get_all(missing, self.construction, self.workers)):
+            self.rule_nfas[regex] = nfa
+        self.rule_nfas = {regex: self.rule_nfas[regex] for _, regex in spec}
+
+    def rule_states(self, index: int) -> range:
+        # the states of a rule in the merged nfa, none if it has no range
+        offset = self.rule_offsets[index]
+        if offset is None:
+            return range(0)
+        return range(offset, offset + max(self.rule_nfas[self.spec[index][1]].K) + 1)
+
+    def assemble(self, spec: list[tuple[str, str]]) -> None:
+        # merge the nfas of the rules into self.nfa, giving a range of states
+        # to the rules that have none in rule_offsets
         # prepare the setup for the nfa
         S = set()
-        K = set()
+        K = {0}
         q0 = 0
         d = {}
         F = set()
-        q0s = set()
-        self.tokens = {}
-        # create the nfa
-        for regex in spec:
-            nfa = parse_regex(regex[1]).thompson()
-            q0s.add(nfa.q0)
+        # the final states of each rule, in the order of the spec
+        tokens = []
+        # create the nfa; the states of every rule are numbered from 0, so they
+        # are moved to the range of the rule
+        for index, (name, regex) in enumerate(spec):
+            if self.rule_offsets[index] is None:
+                self.rule_offsets[index] = self.next_offset
+                self.next_offset += max(self.rule_nfas[regex].K) + 1
+            offset = self.rule_offsets[index]
+            nfa = self.rule_nfas[regex].remap_states(lambda state: state + offset)
             S.update(nfa.S)
             K.update(nfa.K)
-            K.add(nfa.q0)
             d.update(nfa.d)
             F.update(nfa.F)
-            self.tokens[frozenset(nfa.F)] = regex[0]
-        # put a new initial state that has alternatives to each old initial states
-        d[(q0, '')] = q0s
-            
+            finals = set(nfa.F)
+            # the new initial state has the transitions of every old initial state,
+            # and it is final for the rules that accept the empty word
+            for (state, symbol), next_states in nfa.d.items():
+                if state == nfa.q0:
+                    d.setdefault((q0, symbol), set()).update(next_states)
+            if nfa.q0 in nfa.F:
+                finals.add(q0)
+                F.add(q0)
+            tokens.append((frozenset(finals), name))
+        # the nfa has no epsilon transitions and no useless states, it is ready to be determinized
         self.nfa = NFA(S, K, q0, d, F)
-        # create the dfa
-        self.dfa = self.nfa.subset_construction()
+        self.set_spec(spec, tokens)
+
+    def edit(self, spec: list[tuple[str, str]], offsets: list[int | None], removed: set[int]) -> None:
+        # the lexer for the edited spec: offsets are the ranges of states of its rules, None
+        # for the new ones, and removed the states of the rules that are gone. the lazy dfa
+        # keeps the rows that do not reach the edited rules, and so does the dfa engine, which
+        # then only determinizes the new rows. its table is compiled again but not minimized,
+        # so after edits it can have more rows than the table build gives for the same spec.
+        # the other engines, and the lexers loaded from a table, are built again
+        runner = self.runner if self.engine == 'lazy' else self.rows
+        if runner is None:
+            self.build(spec)
+            return
+        self.load_rules(spec)
+        self.rule_offsets = offsets
+        self.assemble(spec)
+        runner.update(self.nfa, removed)
+        if self.engine == 'dfa':
+            self.dfa = runner.dfa()
+            self.compile()
+
+    def set_spec(self, spec: list[tuple[str, str]], tokens: list[tuple[frozenset, str]]) -> None:
+        # the token ids are the indexes of the rules in the spec
+        self.spec = spec
+        self.names = [name for name, _ in spec]
+        self.tokens = tokens
+        # the first rule of every final state, so token_id does not go through all the rules
+        self.final_rules = {}
+        for index, (finals, _) in enumerate(tokens):
+            for state in finals:
+                self.final_rules.setdefault(state, index)
+
+    def add_rule(self, name: str, regex: str, index: int | None = None) -> None:
+        # a new rule, with the lowest priority or at the given index of the spec.
+        # the states of the other rules do not change, see edit
+        spec = list(self.editable_spec())
+        offsets = list(self.rule_offsets)
+        index = len(spec) if index is None else index
+        spec.insert(index, (name, regex))
+        offsets.insert(index, None)
+        self.edit(spec, offsets, set())
+
+    def remove_rule(self, name: str) -> None:
+        index = self.rule_index(name)
+        removed = set(self.rule_states(index))
+        spec = list(self.spec)
+        offsets = list(self.rule_offsets)
+        del spec[index]
+        del offsets[index]
+        self.edit(spec, offsets, removed)
+
+    def replace_rule(self, name: str, regex: str) -> None:
+        # the new regex keeps the priority of the rule, and gets new states
+        index = self.rule_index(name)
+        removed = set(self.rule_states(index))
+        spec = list(self.spec)
+        offsets = list(self.rule_offsets)
+        spec[index] = (name, regex)
+        offsets[index] = None
+        self.edit(spec, offsets, removed)
+
+    def editable_spec(self) -> list[tuple[str, str]]:
+        if self.spec is None:
+            raise ValueError('the lexer was loaded from a table without its spec, it has no rules to edit')
+        return self.spec
+
+    def rule_index(self, name: str) -> int:
+        for index, (rule_name, _) in enumerate(self.editable_spec()):
+            if rule_name == name:
+                return index
+        raise ValueError(f'no rule named {name}')
+
+    @classmethod
+    def from_table(cls, table: DFATable, token_ids: array, names: list[str],
+                   spec: list[tuple[str, str]] | None = None, engine: str = 'dfa', cache_size: int = 1000,
+                   construction: str = 'thompson', workers: int = 1) -> 'Lexer':
+        # a lexer that runs on a table that is already built (e.g. loaded from the lexer cache),
+        # with the token id of every row and the names of the tokens. with the spec and the
+        # options the table was built from, the rules can be edited: the first edit builds the
+        # lexer like a new Lexer, there are no rows to keep
+        lexer = cls.__new__(cls)
+        lexer.engine = engine
+        lexer.cache_size = cache_size
+        lexer.construction = construction
+        lexer.workers = workers
+        lexer.rule_nfas = {}
+        lexer.spec = None if spec is None else list(spec)
+        lexer.rule_offsets = None if spec is None else [None] * len(spec)
+        lexer.rows = None
+        lexer.table = table
+        lexer.token_ids = token_ids
+        lexer.names = names
+        return lexer
+
+    def token_id(self, subset: frozenset) -> int:
+        # the index of the first rule from the spec that has a final state in the subset, -1 if none
+        final_rules = self.final_rules
+        return min((final_rules[state] for state in subset if state in final_rules), default=-1)
+
+    def generate_module(self, path: str) -> None:
+        # writes a python module that needs nothing from this package: the table, the token
+        # of every state and a lex function for them, so importing it builds nothing
+        if self.engine in ('lazy', 'nfa'):
+            raise ValueError(f'the {self.engine} engine has no table to generate a module from')
+        write_module(path, module_source(self.table, list(self.token_ids), self.names))
 
     def lex(self, word: str) -> list[tuple[str, str]] | None:
         # this method splits the lexer into tokens based on the specification and the rules described in the lecture
@@ -36,9 +246,19 @@ class Lexer:
         final_res = []
         accepted = ''
         good_token = ('', '')
-        current_state = self.dfa.q0
+        if self.engine in ('lazy', 'nfa'):
+            self.runner.restart()
+            runner = self.runner
+            token_ids = self.runner.token_ids
+        else:
+            runner = self.table
+            token_ids = self.token_ids
+        names = self.names
+        classes = runner.classes
+        table = runner.table
+        start = runner.start
+        current_state = start
         index = 0
-        found = False
         consumed = ''
         which_tokens = []
         new_line = 0
@@ -47,28 +267,26 @@ class Lexer:
         while index < len(word):
             symbol = word[index]
             # check if the symbol is in dfa
-            if not symbol in self.dfa.S:
+            column = classes[symbol]
+            if column < 0:
                 final_res.clear()
                 final_res.append(('', f'No viable alternative at character {index - new_line}, line {lines}'))
                 break
             # check if current state and symbol does not go to a SINK STATE
-            if (current_state, symbol) in self.dfa.d and self.dfa.d[(current_state, symbol)] != frozenset():
+            next_state = table[current_state][column]
+            if next_state == UNKNOWN:
+                # only with the lazy dfa or the nfa, the transition is computed now
+                next_state = self.runner.step(current_state, column, index)
+            if next_state != DEAD:
                 # consume
-                next_state = self.dfa.d[(current_state, symbol)]
                 current_state = next_state
                 # update the accepted characters so far
                 accepted += symbol                                                                                                                                                                                                                                                                                                                                      
-                # find the current token that matches the accepted
-                for token in self.tokens:
-                    for elem in token:
-                        if elem in current_state:
-                            good_token = (self.tokens[token], accepted)
-                            which_tokens.append(good_token)
-                            found = True
-                            break
-                    if found:
-                        found = False
-                        break               
+                # the token that matches the accepted characters, resolved when the table was built
+                token = token_ids[current_state]
+                if token >= 0:
+                    good_token = (names[token], accepted)
+                    which_tokens.append(good_token)
                 index += 1
                 # update on which line the cursor is
                 if symbol == '\n':
@@ -92,7 +310,7 @@ class Lexer:
                 # if there are, we put the best token in the result
                 final_res.append(good_token)
                 # reset and start a new consumption
-                current_state = self.dfa.q0
+                current_state = start
                 consumed += good_token[1]
                 accepted = ''
                 index = len(consumed)
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import tempfile
+from array import array
+
+from .Alphabet import Alphabet
+from .DFA import DFATable
+from .Lexer import Lexer
+
+# changed every time the layout of the saved entries changes
+CACHE_FORMAT = 2
+
+# the modules that parse the regexes and build the tables: any change to their source
+# changes the version, so the entries written by other versions are not used anymore
+SOURCE_MODULES = ('Alphabet', 'DFA', 'Derivatives', 'Lexer', 'NFA', 'Regex', 'RegexCache', 'RegToNfaUtils')
+
+# the engines that run on a table that can be saved
+TABLE_ENGINES = ('dfa', 'derivatives')
+
+# the options that change how a lexer is built but not its table, left out of the keys
+BUILD_OPTIONS = ('workers',)
+
+
+def source_version(directory: str = os.path.dirname(os.path.abspath(__file__))) -> str:
+    # the cache format and a hash of the source of SOURCE_MODULES, read from the directory
+    digest = hashlib.sha256()
+    for name in SOURCE_MODULES:
+        with open(os.path.join(directory, name + '.py'), 'rb') as file:
+            source = file.read()
+        digest.update(f'{name} {len(source)}\n'.encode('utf-8'))
+        digest.update(source)
+    return f'{CACHE_FORMAT}-{digest.hexdigest()[:16]}'
+
+
+CACHE_VERSION = source_version()
+
+
+def default_directory() -> str:
+    # $LEXER_CACHE_DIR, or a directory in the user cache
+    if 'LEXER_CACHE_DIR' in os.environ:
+        return os.environ['LEXER_CACHE_DIR']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'lambda-lexer')
+
+
+class LexerCache:
+    def __init__(self, directory: str | None = None) -> None:
+        # the compiled tables of the lexers, saved as json files in the directory, one
+        # for each spec and set of options. a lexer that is found there is loaded
+        # instead of being built again; when the directory can not be read or written
+        # the lexers are just built
+        self.directory = directory if directory is not None else default_directory()
+
+    def key(self, spec: list[tuple[str, str]], **options: str) -> str:
+        options = sorted((name, value) for name, value in options.items() if name not in BUILD_OPTIONS)
+        text = json.dumps([CACHE_VERSION, options, [list(rule) for rule in spec]])
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def path(self, spec: list[tuple[str, str]], **options: str) -> str:
+        return os.path.join(self.directory, self.key(spec, **options) + '.json')
+
+    def get(self, spec: list[tuple[str, str]], **options: str) -> Lexer:
+        # the lexer of the spec, from the cache when it is there
+        if options.get('engine', 'dfa') not in TABLE_ENGINES:
+            return Lexer(spec, **options)
+        lexer = self.load(spec, **options)
+        if lexer is None:
+            lexer = Lexer(spec, **options)
+            self.store(lexer, spec, **options)
+        return lexer
+
+    def load(self, spec: list[tuple[str, str]], **options: str) -> Lexer | None:
+        try:
+            with open(self.path(spec, **options), 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            return load_lexer(data, spec, **options)
+        except (OSError, ValueError, KeyError, TypeError):
+            # missing or broken entry
+            return None
+
+    def store(self, lexer: Lexer, spec: list[tuple[str, str]], **options: str) -> None:
+        # the file is written next to its final place and then renamed,
+        # so other processes never read half of it
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            (handle, temporary) = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(handle, 'w', encoding='utf-8') as file:
+                    json.dump(dump_lexer(lexer), file, separators=(',', ':'))
+                os.replace(temporary, self.path(spec, **options))
+            except BaseException:
+                os.unlink(temporary)
+                raise
+        except OSError:
+            pass
+
+
+def dump_lexer(lexer: Lexer) -> dict:
+    # the parts of a lexer that lex uses
+    table = lexer.table
+    return {
+        'version': CACHE_VERSION,
+        'alphabet': {'starts': table.alphabet.starts,
+                     'classes': table.alphabet.interval_classes,
+                     'size': table.alphabet.size},
+        'columns': table.columns,
+        'width': table.width,
+        'table': [list(row) for row in table.table],
+        'start': table.start,
+        'final': list(table.final),
+        'token_ids': list(lexer.token_ids),
+        'names': lexer.names,
+    }
+
+
+def load_lexer(data: dict, spec: list[tuple[str, str]] | None = None, **options: str) -> Lexer:
+    # the entry is checked before it is used, so a broken one is built again instead of
+    # failing in lex. with the spec and the options of the entry, the lexer can be edited
+    if data['version'] != CACHE_VERSION:
+        raise ValueError(f'lexer cache version {data["version"]}')
+    (starts, classes, size) = (data['alphabet']['starts'], data['alphabet']['classes'], data['alphabet']['size'])
+    (columns, width, rows, start) = (data['columns'], data['width'], data['table'], data['start'])
+    (final, token_ids, names) = (data['final'], data['token_ids'], data['names'])
+    if len(classes) != len(starts) or any(not -1 <= class_id < size for class_id in classes):
+        raise ValueError('lexer cache entry with a broken alphabet')
+    if len(columns) != size or any(not -1 <= column < width for column in columns):
+        raise ValueError('lexer cache entry with broken columns')
+    if not rows or any(len(row) != width or any(not 0 <= state < len(rows) for state in row) for row in rows):
+        raise ValueError('lexer cache entry with a broken table')
+    if not 0 <= start < len(rows) or len(final) != len(rows) or len(token_ids) != len(rows):
+        raise ValueError('lexer cache entry with a broken start, final states or tokens')
+    if any(not -1 <= token < len(names) for token in token_ids):
+        raise ValueError('lexer cache entry with broken tokens')
+    if spec is not None and names != [name for name, _ in spec]:
+        raise ValueError('lexer cache entry for another spec')
+    alphabet = Alphabet(starts, classes, size)
+    table = DFATable(alphabet.lookup(columns), width, [array('i', row) for row in rows], start, bytearray(final),
+                     [None] + list(range(1, len(rows))), alphabet, columns)
+    return Lexer.from_table(table, array('i', token_ids), names, spec, **options)
+
+
+# the cache used by the parser
+lexer_cache = LexerCache()
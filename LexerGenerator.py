@@ -0,0 +1,117 @@
+import os
+import tempfile
+
+from .Alphabet import BLOCK_BITS, BLOCK_MASK
+from .DFA import DEAD, DFATable
+
+# the code of a generated lexer. the tables are filled in by module_source, and lex
+# gives the same tokens and errors as Lexer.lex: it is the loop of Lexer.lex for a
+# dense table, with the class lookup inlined and the tokens sliced out of the word.
+# the loop is not unrolled for every state: python has no jump table, so the branches
+# of the states are tried one after the other, and with the rows bound to locals it
+# was slower than indexing the table (85 ms against 72 ms on the benchmark spec, 21
+# states, and 163 ms against 49 ms on the keywords spec, 1320 states)
+LEX_TEMPLATE = '''\
+def lex(word: str) -> list[tuple[str, str]]:
+    table = TABLE
+    token_ids = TOKEN_IDS
+    names = NAMES
+    index_table = INDEX
+    blocks = BLOCKS
+    length = len(word)
+    final_res = []
+    good_token = ('', '')
+    matched = False
+    current_state = START
+    token_start = 0
+    index = 0
+    new_line = 0
+    lines = 0
+    while index < length:
+        symbol = word[index]
+        code = ord(symbol)
+        column = blocks[index_table[code >> {block_bits}]][code & {block_mask}]
+        if column < 0:
+            return [('', f'No viable alternative at character {{index - new_line}}, line {{lines}}')]
+        next_state = table[current_state][column]
+        if next_state != {dead}:
+            current_state = next_state
+            index += 1
+            token = token_ids[current_state]
+            if token >= 0:
+                good_token = (names[token], word[token_start:index])
+                matched = True
+            if symbol == '\\n':
+                new_line = index
+                lines += 1
+            if index == length:
+                if not matched:
+                    return [('', f'No viable alternative at character EOF, line {{lines}}')]
+                final_res.append(good_token)
+        else:
+            # go back to the end of the longest token and start again from there
+            if not matched:
+                return [('', f'No viable alternative at character {{index - new_line}}, line {{lines}}')]
+            final_res.append(good_token)
+            current_state = START
+            token_start += len(good_token[1])
+            index = token_start
+            matched = False
+    return final_res
+'''
+
+
+def literal(values: tuple) -> str:
+    # a tuple literal, cut into lines between whole items, so a string is never split
+    if len(values) == 1:
+        return f'({values[0]!r},)'
+    lines = []
+    line = ''
+    for value in values:
+        item = repr(value) + ','
+        if line and len(line) + 1 + len(item) > 96:
+            lines.append(line)
+            line = item
+        else:
+            line = f'{line} {item}' if line else item
+    lines.append(line)
+    return '(\n' + '\n'.join('    ' + line for line in lines) + '\n)'
+
+
+def module_source(table: DFATable, token_ids: list[int], names: list[str]) -> str:
+    # the source of a module that lexes like a lexer with this table, without the package
+    if table.alphabet is None:
+        raise ValueError('only the tables of dfas over an alphabet can be generated')
+    classes = table.alphabet.table(table.columns)
+    rows = ',\n'.join('    ' + (repr(tuple(row)) if len(row) != 1 else f'({row[0]},)') for row in table.table)
+    blocks = ',\n'.join('    ' + literal(tuple(block)).replace('\n', '\n    ') for block in classes.blocks)
+    return '\n'.join([
+        '# generated by Lexer.generate_module, do not edit',
+        '# the tokens, by priority: ' + ' '.join(repr(name) for name in names),
+        '',
+        f'START = {table.start}',
+        f'NAMES = {literal(tuple(names))}',
+        '# the token matched in each state, -1 if none',
+        f'TOKEN_IDS = {literal(tuple(token_ids))}',
+        '# TABLE[state][column] -> next state',
+        f'TABLE = (\n{rows},\n)',
+        f'# the column of a character: BLOCKS[INDEX[code >> {BLOCK_BITS}]][code & {BLOCK_MASK}], -1 if none',
+        f'INDEX = {literal(tuple(classes.index))}',
+        f'BLOCKS = (\n{blocks},\n)',
+        '',
+        '',
+        LEX_TEMPLATE.format(block_bits=BLOCK_BITS, block_mask=BLOCK_MASK, dead=DEAD),
+    ])
+
+
+def write_module(path: str, source: str) -> None:
+    # written next to its final place and then renamed, so the module is never half written
+    directory = os.path.dirname(os.path.abspath(path))
+    (handle, temporary) = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'w', encoding='utf-8') as file:
+            file.write(source)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
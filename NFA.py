@@ -1,6 +1,7 @@
 from .DFA import DFA
+from .Alphabet import Alphabet, CharSet
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from collections.abc import Callable
 
 EPSILON = ''  # this is how epsilon is represented by the checker in the transition function of NFAs
@@ -8,102 +9,345 @@ EPSILON = ''  # this is how epsilon is represented by the checker in the transit
 
 @dataclass
 class NFA[STATE]:
-    S: set[str]
+    # the labels of the transitions are characters or CharSets (character classes)
+    S: set[str | CharSet]
     K: set[STATE]
     q0: STATE
-    d: dict[tuple[STATE, str], set[STATE]]
+    d: dict[tuple[STATE, str | CharSet], set[STATE]]
     F: set[STATE]
     
     
-    def epsilon_closure_aux(self, epsilon_closure: set[STATE], state: STATE) -> set[STATE]:
-        # verify if there is an epsilon transition from state
-        if (state, '') in self.d:
-            # add the state if it has not been added yet
-            if state not in epsilon_closure:
-                epsilon_closure.add(state)
-            # add all epsilon transitions from state
-            for next_state in self.d[(state, '')]:
-                if next_state in epsilon_closure:
-                    continue
-                epsilon_closure.add(next_state)
-                # update the set[STATE] with other possible epsilon transition from next_state
-                epsilon_closure.update(self.epsilon_closure_aux(epsilon_closure, next_state))
-        return epsilon_closure
-    
-    def epsilon_closure(self, state: STATE) -> set[STATE]:
-        epsilon_closures = set()
-        return self.epsilon_closure_aux(epsilon_closures, state)
+    # epsilon closures of every state, filled in once by the first epsilon_closure call
+    closures: dict[STATE, frozenset[STATE]] | None = field(default=None, init=False, repr=False, compare=False)
+
+    def compute_epsilon_closures(self) -> dict[STATE, frozenset[STATE]]:
+        # the epsilon edges are condensed into strongly connected components with an
+        # iterative version of Tarjan's algorithm: every state from a component has
+        # the same closure, and a component is finished only after all the components
+        # it reaches, so its closure is made of its own states and the closures
+        # that have already been computed for its successors
+        epsilon_edges = {state: next_states
+                         for (state, symbol), next_states in self.d.items()
+                         if symbol == EPSILON}
+        # states may appear only in the transition function, not in K
+        states = set().union(self.K, self.F)
+        states.add(self.q0)
+        for (state, _), next_states in self.d.items():
+            states.add(state)
+            states.update(next_states)
+
+        closures = {}
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        for root in states:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(epsilon_edges.get(root, ())))]
+            while work:
+                state, successors = work[-1]
+                for next_state in successors:
+                    if next_state not in index:
+                        # go deeper, the rest of the successors are visited when we come back
+                        index[next_state] = low[next_state] = len(index)
+                        stack.append(next_state)
+                        on_stack.add(next_state)
+                        work.append((next_state, iter(epsilon_edges.get(next_state, ()))))
+                        break
+                    if next_state in on_stack:
+                        low[state] = min(low[state], index[next_state])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[state])
+                    if low[state] != index[state]:
+                        continue
+                    # state is the root of a component, pop the whole component
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                        if member == state:
+                            break
+                    closure = set(component)
+                    for member in component:
+                        for next_state in epsilon_edges.get(member, ()):
+                            if next_state not in component:
+                                closure.update(closures[next_state])
+                    closure = frozenset(closure)
+                    for member in component:
+                        closures[member] = closure
+        self.closures = closures
+        return closures
+
+    def epsilon_closure(self, state: STATE) -> frozenset[STATE]:
+        # the table is computed on the first call, so the transitions
+        # should not be changed afterwards without calling compute_epsilon_closures again
+        if self.closures is None:
+            self.compute_epsilon_closures()
+        if state in self.closures:
+            return self.closures[state]
+        return frozenset([state])
+
+    # the bit-parallel form of the nfa, filled in by the first call of accept
+    compiled: 'BitNFA | None' = field(default=None, init=False, repr=False, compare=False)
+
+    def accept(self, word: str) -> bool:
+        # simulate the nfa directly, with the set of current states kept as the bits of an int
+        if self.compiled is None:
+            self.compile()
+        return self.compiled.accept(word)
+
+    def compile(self, alphabet: Alphabet | None = None) -> 'BitNFA':
+        # every state becomes a bit. a transition from bit i into bit i + offset is stored
+        # in the mask of source states for its symbol and offset, so a step moves all the
+        # current states at once with a shift for every offset. the states are kept in
+        # their natural order when possible: thompson numbers the two ends of every
+        # symbol transition one after the other, so most of the offsets are 1
+        states = set().union(self.K, self.F)
+        states.add(self.q0)
+        for (state, _), next_states in self.d.items():
+            states.add(state)
+            states.update(next_states)
+        try:
+            states = sorted(states)
+        except TypeError:
+            states = list(states)
+        bits = {state: bit for bit, state in enumerate(states)}
+
+        if alphabet is None:
+            alphabet = self.alphabet()
+        moves = [{} for _ in range(len(alphabet))]
+        for (state, symbol), next_states in self.d.items():
+            if symbol == EPSILON:
+                continue
+            for column in alphabet.classes_of(symbol):
+                offsets = moves[column]
+                for next_state in next_states:
+                    offset = bits[next_state] - bits[state]
+                    offsets[offset] = offsets.get(offset, 0) | 1 << bits[state]
+
+        closures = []
+        expanding = 0
+        for bit, state in enumerate(states):
+            mask = 0
+            for closure_state in self.epsilon_closure(state):
+                mask |= 1 << bits[closure_state]
+            closures.append(mask)
+            if mask != 1 << bit:
+                expanding |= 1 << bit
+        final = 0
+        for state in self.F:
+            final |= 1 << bits[state]
+        self.compiled = BitNFA(alphabet.lookup(), states, closures[bits[self.q0]], final,
+                               [list(offsets.items()) for offsets in moves], closures, expanding)
+        return self.compiled
+
+    def alphabet(self) -> Alphabet:
+        # split the characters into classes: two characters are in the same class
+        # when every state goes into the same states on both of them
+        return Alphabet.partition(((symbol, (state, frozenset(next_states)))
+                                   for (state, symbol), next_states in self.d.items()
+                                   if symbol != EPSILON),
+                                  (symbol for symbol in self.S if symbol != EPSILON))
 
     # Convert this NFA to a DFA using the subset construction algorithm
-    def subset_construction(self) -> DFA[frozenset[STATE]]:
-        
-        # creating the initial state of the DFA
-        dfa_q0_aux = self.epsilon_closure(self.q0)
-        q0_aux = frozenset()
-        # if the outcome is not a set of states
-        if dfa_q0_aux == set():
-            # epsilon closure returned nothing, so initial state from the NFA 
-            # is the same in the DFA
-            q0_aux = frozenset([self.q0])
+    # the DFA states are dense ints, the set of NFA states behind each of them is kept in dfa.subsets
+    # given an alphabet, the DFA is built over its class ids instead of the symbols; the
+    # NFAs with character classes always get one, since a class can not be a DFA symbol
+    def subset_construction(self, alphabet: Alphabet | None = None) -> DFA[int]:
+        if alphabet is None and any(isinstance(symbol, CharSet) for symbol in self.S):
+            alphabet = self.alphabet()
+        # the symbols of the DFA; epsilon is never one of them
+        if alphabet is None:
+            columns = {symbol: [symbol] for symbol in self.S if symbol != EPSILON}
         else:
-            # create initial state for DFA
-            q0_aux = frozenset(dfa_q0_aux)
-        
-        # initialize the list of the DFA states
-        states_list = []
-        # initialize the list of the DFA final states
-        final_states = []
-        # initialize a list of DFA states that have not been treated 
-        list_aux = []
-        # initialize the dictionary of the DFA 
+            columns = {symbol: alphabet.classes_of(symbol) for symbol in self.S if symbol != EPSILON}
+        # group the transitions of the NFA by their source state, so a subset
+        # only looks at the transitions of its own states
+        moves = {}
+        for (state, symbol), next_states in self.d.items():
+            if symbol in columns:
+                for column in columns[symbol]:
+                    moves.setdefault(state, []).append((column, next_states))
+        symbols = set(range(len(alphabet))) if alphabet is not None else set(columns)
+
+        # creating the initial state of the DFA
+        q0_subset = self.epsilon_closure(self.q0)
+        # every subset gets the next free id as soon as it is found and
+        # is treated exactly once, in the order the ids were given
+        ids = {q0_subset: 0}
+        subsets = [q0_subset]
+        final_states = set()
         new_dict = dict()
-        # add the initial state of the DFA
-        list_aux.append(q0_aux)
+        index = 0
+        while index < len(subsets):
+            subset = subsets[index]
+            # the DFA state is final if it contains a final state of the NFA
+            if not self.F.isdisjoint(subset):
+                final_states.add(index)
+            # collect the epsilon closures of the states reached on every symbol
+            targets = {}
+            for old_state in subset:
+                for symbol, old_next_states in moves.get(old_state, ()):
+                    target = targets.setdefault(symbol, set())
+                    for old_next_state in old_next_states:
+                        target.update(self.epsilon_closure(old_next_state))
+            for symbol in symbols:
+                # symbols without transitions lead to the empty subset (the sink state)
+                created_state = frozenset(targets.get(symbol, ()))
+                created_id = ids.get(created_state)
+                if created_id is None:
+                    created_id = len(subsets)
+                    ids[created_state] = created_id
+                    subsets.append(created_state)
+                new_dict[(index, symbol)] = created_id
+            index += 1
+        return DFA(symbols, set(range(len(subsets))), 0, new_dict, final_states,
+                   dict(enumerate(subsets)), alphabet)
 
-        while list_aux:
-            state = list_aux.pop()
-            # check if the state has already been treated
-            if state in states_list:
-                continue
-            # add the state to the DFA's list of states
-            states_list.append(state)
-            # iterate through each symbol of the DFA
-            for symbol in self.S:
-                new_state = []
-                # check if the state that is being treated
-                # has final states from the NFA
-                # if it does, add the state in the list of the DFA final states
-                final_states.extend([frozenset(state)
-                                     for s in state
-                                     if s in self.F])
-                # iterate through each state from the DFA state
-                # check the NFA dictionary for new states ready
-                # for the DFA  
-                for old_state in state:
-                    if (old_state, symbol) in self.d:
-                        # iterate through each state
-                        # that an old state (called old_next_state) has with the certain symbol
-                        # create a frozenset of the old_next_state and other states
-                        # that come from the epsilon closure applied on the old_next_state
-                        # if the old_next_state has no epsilon transitions
-                        # just add the old_next_state
-                        # extend the new_state
-                        new_state.extend([frozenset(self.epsilon_closure(old_next_state))
-                                          if frozenset(self.epsilon_closure(old_next_state)) != frozenset()
-                                          else frozenset([old_next_state])
-                                          for old_next_state in self.d[(old_state, symbol)]])
-                # merge all the frozensets from the list into a single frozenset
-                # so it creates the new state for the DFA
-                created_state = frozenset().union(*new_state)
-                # add the created state to be treated next
-                list_aux.append(created_state)
-                # update the DFA dictionary for the state that has been treated
-                # with the transition to created state with the certain symbol
-                new_dict[(frozenset(state), symbol)] = created_state
-        return DFA(self.S, frozenset(states_list), q0_aux, new_dict, frozenset(final_states))
+    def remove_epsilons(self) -> 'NFA[STATE]':
+        # an equivalent nfa without epsilon transitions: a state gets the symbol transitions
+        # of all the states from its epsilon closure, and it is final if its closure has
+        # a final state. only q0 and the states entered by a symbol are kept, the others
+        # could only be reached through epsilon transitions
+        moves = {}
+        states = {self.q0}
+        for (state, symbol), next_states in self.d.items():
+            if symbol != EPSILON:
+                moves.setdefault(state, []).append((symbol, next_states))
+                states.update(next_states)
+        new_dict = {}
+        for state in states:
+            for closure_state in self.epsilon_closure(state):
+                for symbol, next_states in moves.get(closure_state, ()):
+                    new_dict.setdefault((state, symbol), set()).update(next_states)
+        final_states = {state for state in states if not self.F.isdisjoint(self.epsilon_closure(state))}
+        return NFA({symbol for symbol in self.S if symbol != EPSILON}, states, self.q0, new_dict, final_states)
 
+    def trim(self) -> 'NFA[STATE]':
+        # keep only the states that can be reached from q0 and from which a final state
+        # can be reached (q0 is always kept, even when the language is empty)
+        successors = {}
+        predecessors = {}
+        for (state, _), next_states in self.d.items():
+            successors.setdefault(state, set()).update(next_states)
+            for next_state in next_states:
+                predecessors.setdefault(next_state, set()).add(state)
+        reachable = {self.q0}
+        stack = [self.q0]
+        while stack:
+            for next_state in successors.get(stack.pop(), ()):
+                if next_state not in reachable:
+                    reachable.add(next_state)
+                    stack.append(next_state)
+        useful = self.F & reachable
+        stack = list(useful)
+        while stack:
+            for previous_state in predecessors.get(stack.pop(), ()):
+                if previous_state in reachable and previous_state not in useful:
+                    useful.add(previous_state)
+                    stack.append(previous_state)
+        useful.add(self.q0)
+        new_dict = {}
+        for (state, symbol), next_states in self.d.items():
+            if state in useful and not useful.isdisjoint(next_states):
+                new_dict[(state, symbol)] = next_states & useful
+        return NFA(set(self.S), useful, self.q0, new_dict, self.F & useful)
 
     def remap_states[OTHER_STATE](self, f: 'Callable[[STATE], OTHER_STATE]') -> 'NFA[OTHER_STATE]':
         # optional, but may be useful for the second stage of the project. Works similarly to 'remap_states'
         # from the DFA class. See the comments there for more details.
-        pass
\ No newline at end of file
+        states = set().union(self.K, self.F)
+        states.add(self.q0)
+        for (state, _), next_states in self.d.items():
+            states.add(state)
+            states.update(next_states)
+        new_names = {state: f(state) for state in states}
+        return NFA(set(self.S),
+                   {new_names[state] for state in self.K},
+                   new_names[self.q0],
+                   {(new_names[state], symbol): {new_names[next_state] for next_state in next_states}
+                    for (state, symbol), next_states in self.d.items()},
+                   {new_names[state] for state in self.F})
+
+    def renumber(self) -> 'NFA[int]':
+        # rename the states to 0..n-1, in the order they are reached from q0 (breadth first,
+        # epsilon transitions included) with the unreachable states at the end
+        successors = {}
+        for (state, symbol), next_states in sorted(self.d.items(), key=lambda item: str(item[0][1])):
+            successors.setdefault(state, []).extend(next_states)
+        order = {self.q0: 0}
+        queue = [self.q0]
+        index = 0
+        while index < len(queue):
+            for next_state in successors.get(queue[index], ()):
+                if next_state not in order:
+                    order[next_state] = len(order)
+                    queue.append(next_state)
+            index += 1
+        for state in self.K:
+            if state not in order:
+                order[state] = len(order)
+        return self.remap_states(order.__getitem__)
+
+
+@dataclass
+class BitNFA[STATE]:
+    # character -> column of moves (-1 for the characters that are not in the alphabet)
+    classes: dict[str, int]
+    # the state behind each bit
+    states: list[STATE]
+    # the epsilon closure of q0
+    start: int
+    final: int
+    # moves[column] = [(offset, mask of the states that go offset bits up on the symbol)]
+    moves: list[list[tuple[int, int]]]
+    # the epsilon closure of each state
+    closures: list[int]
+    # the states with more than themselves in their epsilon closure
+    expanding: int
+
+    def step(self, mask: int, column: int) -> int:
+        moved = 0
+        for offset, sources in self.moves[column]:
+            active = mask & sources
+            if active:
+                moved |= active << offset if offset >= 0 else active >> -offset
+        # the closures of the states that have no epsilon transitions are the states themselves
+        expanding = moved & self.expanding
+        moved ^= expanding
+        closures = self.closures
+        while expanding:
+            lowest = expanding & -expanding
+            moved |= closures[lowest.bit_length() - 1]
+            expanding ^= lowest
+        return moved
+
+    def final_states(self, mask: int) -> frozenset[STATE]:
+        # the final states among the states of the mask
+        mask &= self.final
+        states = []
+        while mask:
+            lowest = mask & -mask
+            states.append(self.states[lowest.bit_length() - 1])
+            mask ^= lowest
+        return frozenset(states)
+
+    def accept(self, word: str) -> bool:
+        classes = self.classes
+        mask = self.start
+        for symbol in word:
+            column = classes[symbol]
+            if column < 0:
+                return False
+            mask = self.step(mask, column)
+            if not mask:
+                return False
+        return mask & self.final != 0
@@ -1,5 +1,8 @@
+from threading import Lock
+
 from .AST import AST, List, Num, Op
 from .Lexer import Lexer
+from .LexerCache import lexer_cache
 
 spec = [('SPACE', '\\ '), 
 		('NEWLINE', '\n'),
@@ -20,8 +23,26 @@ lambda_spec = [('SPACE', '\\ '),
 				('VALUE', '\\(*\\ *(:|[a-z]|[A-Z]|\\ |\\+|[0-9]|\t|\n)+\\ *\\)*'),
 				('RPARA', ')')]
 
-lexer = Lexer(spec)
-lambda_lexer = Lexer(lambda_spec)
+# the lexers of the module, built the first time they are used and not when the module
+# is imported: lambda_lexer is only needed by programs with a LAMBDA token.
+# their tables are saved in the lexer cache, so they are built only once
+lexer_specs = {'lexer': spec, 'lambda_lexer': lambda_spec}
+lexers = {}
+lexers_lock = Lock()
+
+def get_lexer(name: str = 'lexer') -> Lexer:
+	# the lexer is built by only one thread, the others wait for it
+	if name not in lexers:
+		with lexers_lock:
+			if name not in lexers:
+				lexers[name] = lexer_cache.get(lexer_specs[name])
+	return lexers[name]
+
+def __getattr__(name: str) -> Lexer:
+	# Parser.lexer and Parser.lambda_lexer still work, the lexer is built when it is read
+	if name in lexer_specs:
+		return get_lexer(name)
+	raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 def parse(tokens: list, root: AST) -> AST:
     # analyze the list of tokens
@@ -199,7 +220,7 @@ def evaluate_lambda(tokens) -> list:
 	while values:
 		new_expression += values.pop(0) + ')'
 	# get the new tokens
-	lambda_res = lexer.lex(new_expression)
+	lambda_res = get_lexer().lex(new_expression)
 	for what in lambda_res:
 		# check if the new expression has lambda in it
 		# if so, there will be a new evaluation of the new lambda expression
@@ -217,7 +238,7 @@ def get_values_and_expr(tokens: list) -> (list, str, list):
 	for token in tokens:
 		expression += token[1]
 	# get the lambda tokens
-	lambda_res = lambda_lexer.lex(expression)
+	lambda_res = get_lexer('lambda_lexer').lex(expression)
 	expression = ''
 	for index, token in enumerate(lambda_res):
 		# case where the token has the expression and the value and it is being seen as a value
@@ -339,10 +360,10 @@ def get_values_and_expr(tokens: list) -> (list, str, list):
 
 def print_result(filename: str):
 	expression = ''
-	with open(filename, 'r') as file:
+	with open(filename, 'r', encoding='utf-8') as file:
 		# Read the contents of the file into a string
 		expression = file.read()
-	tokens = lexer.lex(expression)
+	tokens = get_lexer().lex(expression)
 	root = parse(tokens, AST())
 	res = evaluate(root)
 	print(res)
\ No newline at end of file
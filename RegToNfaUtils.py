@@ -12,136 +12,143 @@ def priority(char: chr) -> int:
         case '*': return 1
         case '?': return 1
         case '+': return 1
+        case _ if char.startswith('{'): return 1
         case '&': return 2
         case '|': return 3
         case _: return 4
 
-def isoperation(char: chr) -> bool:
-    operators = ['|', '*', '+', '?', '&']
-    
-    return char in operators
-
-def issugar(cnt_sugar: int, sugar: bool) -> (int, bool):
-    """
-    Skips the syntactic sugar elements from being analysed
-    in order to analyse the next element from the regex
-
-    Args:
-        cnt_sugar: counter for how many steps are left to skip 
-        sugar: if analysation of the regex is still at the body of the
-        syntactic sugar
+# the kinds of tokens of a regex
+LITERAL = 'literal'
+ESCAPE = 'escape'
+CLASS = 'class'
+OPERATOR = 'operator'
+PAREN = 'paren'
 
-    Returns:
-        Updated arguments
+def class_end(regex: str, index: int) -> int | None:
     """
-    cnt_sugar -= 1
-    if not cnt_sugar:
-        sugar = False
-    return (cnt_sugar, sugar)
+    Finds the end of a character class
 
-def verify_concat(concat: bool, new_regex: str, character: str) -> (bool, str):
-    """
-    This function adds the concatenation character to the regex.
-    
     Args:
-        concat: if the concatenation character can be added
-        new_regex: building string of the regex with the concatenation character
-        character: character to be added to the new_regex
+        regex: given regex as string
+        index: the position right after the '[' that opens the class
 
     Returns:
-        Updated values of the new_regex and concat
+        The position of the ']' that closes the class, or None if it is never closed
     """
-    if concat:
-        new_regex += '&' + character
-    else:
-        new_regex += character
-        concat = True
-    return (concat, new_regex)
+    while index < len(regex):
+        if regex[index] == '\\':
+            index += 2
+            continue
+        if regex[index] == ']':
+            return index
+        index += 1
+    return None
 
-def verify_concat_left_para(concat: bool, new_regex: str, character: str) -> (bool, str):
+def repetition_end(regex: str, index: int) -> int | None:
     """
-    This function adds the concatenation character to the regex
-    and it ends the concatenation process because of the '(' character 
+    Finds the end of a counted repetition: {m}, {m,} or {m,n}
 
     Args:
-        concat: if the concatenation character can be added
-        new_regex: building string of the regex with the concatenation character
-        character: character to be added to the new_regex
+        regex: given regex as string
+        index: the position right after the '{' that opens the repetition
 
     Returns:
-        Updated values of the new_regex and concat
+        The position of the '}' that closes the repetition, or None if the
+        text is not a valid repetition
     """
-    if concat:
-        new_regex += '&' + character
-        concat = False
-    else:
-        new_regex += character
-    
-    return (concat, new_regex)
+    end = regex.find('}', index)
+    if end < 0:
+        return None
+    bounds = regex[index:end].split(',')
+    if len(bounds) > 2 or not bounds[0].isdigit() or not (bounds[-1].isdigit() or bounds[-1] == ''):
+        return None
+    if len(bounds) == 2 and bounds[1] and int(bounds[1]) < int(bounds[0]):
+        return None
+    return end
 
-def operator_preprocess(concat: bool, new_regex: str, character: str) -> (bool, str):
+def repetition_bounds(repetition: str) -> tuple[int, int | None]:
     """
-    This function adds the operator to the new built up regex.
-    
+    The bounds of a counted repetition token
+
     Args:
-        concat: if the concatenation character can be added
-        new_regex: building string of the regex with the concatenation character
-        character: character to be added to the new_regex
+        repetition: the whole repetition, braces included
 
     Returns:
-        Updated values of the new_regex and concat
+        The minimum and the maximum number of repetitions (None when there is no maximum)
     """
-    # check if the concatenation process ends
-    if character == '|':
-        concat = False
-    new_regex += character
-    return (concat, new_regex)
+    bounds = repetition[1:-1].split(',')
+    if len(bounds) == 1:
+        return (int(bounds[0]), int(bounds[0]))
+    return (int(bounds[0]), int(bounds[1]) if bounds[1] else None)
 
-def preprocess_regex(regex: str) -> str:
+def tokenize_regex(regex: str) -> list[tuple[str, str]]:
     """
-    This function creates a new regex which has the concatenation character
-    included so the Shunting Yard algorithm could be applied in process_regex
-    function
+    This function splits the regex into typed tokens in a single pass and adds
+    the concatenation operator '&' between two operands that follow each other,
+    so the Shunting Yard algorithm could be applied in process_regex function.
+    Unescaped spaces are skipped.
 
     Args:
         regex: given regex as string
 
     Returns:
-        The updated regex as string
+        The list of tokens as (kind, value) pairs; the value of an escape is
+        the escaped character and the value of a class is the whole class,
+        brackets included (a '[' that is never closed is a literal), like
+        the value of a counted repetition '{m,n}'
     """
+    tokens = []
+    # if the last token ends an operand, so a concatenation comes before the next operand
     concat = False
-    sugar = False
-    cnt_sugar = 0
-    # variable that helps skip a step
-    # since hitting backslash will analyse
-    # the special character that has backslash
-    was_backslash = False
-    new_regex = ''
-    for index, character in enumerate(regex):
-        if was_backslash:
-            was_backslash = False
+    # the classes can only start before this position: the search for the end of a class
+    # goes through the same characters as this loop, so when a '[' is never closed, no
+    # '[' after it is closed either and the rest of the regex is not searched again
+    unclosed = len(regex) + 1
+    index = 0
+    while index < len(regex):
+        character = regex[index]
+        index += 1
+        if character == '(':
+            if concat:
+                tokens.append((OPERATOR, '&'))
+                concat = False
+            tokens.append((PAREN, character))
             continue
-        elif sugar:
-            (cnt_sugar, sugar) = issugar(cnt_sugar, sugar)
-            continue
-        elif character == '(':
-            (concat, new_regex) = verify_concat_left_para(concat, new_regex, character)
         elif character == ')':
-            new_regex += character
+            tokens.append((PAREN, character))
             concat = True
+            continue
+        elif character == '|':
+            tokens.append((OPERATOR, character))
+            concat = False
+            continue
+        elif character in '*+?':
+            tokens.append((OPERATOR, character))
+            continue
+        elif character == '{' and (end := repetition_end(regex, index)) is not None:
+            # counted repetition case, applied to the last operand like '*'
+            tokens.append((OPERATOR, regex[index - 1:end + 1]))
+            index = end + 1
+            continue
+        elif character == ' ':
+            continue
         elif character == '\\':
-            (concat, new_regex) = verify_concat(concat, new_regex, regex[index:index + 2])
-            was_backslash = True
-        elif character == '[':
-            sugar = True
-            cnt_sugar = 4
-            (concat, new_regex) = verify_concat(concat, new_regex, regex[index:index + 5])
-        elif not isoperation(character) and character != ' ':
-            (concat, new_regex) = verify_concat(concat, new_regex, character)
-        elif isoperation(character):
-            (concat, new_regex) = operator_preprocess(concat, new_regex, character)
-            
-    return new_regex
+            # special symbols case
+            token = (ESCAPE, regex[index:index + 1])
+            index += 1
+        elif character == '[' and index < unclosed and (end := class_end(regex, index)) is not None:
+            # character class case, up to the first ']' that is not escaped
+            token = (CLASS, regex[index - 1:end + 1])
+            index = end + 1
+        else:
+            if character == '[':
+                unclosed = min(unclosed, index)
+            token = (LITERAL, character)
+        if concat:
+            tokens.append((OPERATOR, '&'))
+        tokens.append(token)
+        concat = True
+    return tokens
 
 def add_operations(stack: [], queue: []) -> ([], []):
     """
@@ -156,18 +163,18 @@ def add_operations(stack: [], queue: []) -> ([], []):
     """
     while stack:
         elem = stack.pop()
-        if elem == '(':
+        if elem == (PAREN, '('):
             break
         queue.append(elem)
     return (stack, queue)
 
-def add_operation_to_stack(stack:[], queue: [], character: str) -> ([], []):
+def add_operation_to_stack(stack:[], queue: [], token: tuple[str, str]) -> ([], []):
     """
         Adds a new operation to the stack
     Args:
         stack: Shunting Yard stack
         queue: Shunting Yard queue
-        character: the operation
+        token: the operation
 
     Returns:
         The stack and the queue updated
@@ -182,57 +189,37 @@ def add_operation_to_stack(stack:[], queue: [], character: str) -> ([], []):
     # on the top of the operator stack, or the operator stack is empty.
     while stack:
         elem = stack.pop()
-        if priority(elem) <= priority(character):
+        if priority(elem[1]) <= priority(token[1]):
             queue.append(elem)
         else:
             stack.append(elem)
             break
-    stack.append(character)
+    stack.append(token)
     return (stack, queue)
 
-def process_regex(regex: str) -> list:
+def process_regex(regex: str) -> list[tuple[str, str]]:
     """
-    This function applies Shunting Yard algorithm on regex.
+    This function applies Shunting Yard algorithm on the tokens of the regex.
     
     Documentation: 
     https://blog.cernera.me/converting-regular-expressions-to-postfix-notation-with-the-shunting-yard-algorithm/
 
     Returns:
-        Shunting Yard Queue on which Thompson algorithm will be applied
+        Shunting Yard Queue of tokens on which Thompson algorithm will be applied
     """
     stack = []
     queue = []
-    sugar = False
-    cnt_sugar = 0
-    # variable that helps skip a step
-    # since hitting backslash will analyse
-    # the special character that has backslash
-    was_backslash = False
-    new_regex = preprocess_regex(regex)
-    for index, character in enumerate(new_regex):
-        if was_backslash:
-            was_backslash = False
-            continue
-        elif sugar:
-            (cnt_sugar, sugar) = issugar(cnt_sugar, sugar)
-            continue
-        if character == '\\':
-            # special symbols case
-            queue.append(new_regex[index:index + 2])
-            was_backslash = True
-        elif character == '[':
-            # syntactic sugar case
-            sugar = True
-            cnt_sugar = 4
-            queue.append(new_regex[index:index + 5])
-        elif character == '(':
-            stack.append('(')
-        elif character == ')':
+    for token in tokenize_regex(regex):
+        if token == (PAREN, '('):
+            stack.append(token)
+        elif token == (PAREN, ')'):
             (stack, queue) = add_operations(stack, queue)
-        elif not isoperation(character):
+        elif token[0] == OPERATOR:
+            (stack, queue) = add_operation_to_stack(stack, queue, token)
+        else:
             # if symbol, append it directly to the output queue
-            queue.append(character)
-        elif isoperation(character):
-            (stack, queue) = add_operation_to_stack(stack, queue, character)
-    queue.extend([stack.pop() for _ in range(len(stack))])
+            queue.append(token)
+    # a '(' that is never closed stands for the character itself
+    queue.extend([(LITERAL, elem[1]) if elem[0] == PAREN else elem
+                  for elem in reversed(stack)])
     return queue
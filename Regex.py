@@ -1,12 +1,376 @@
-from .NFA import NFA
-from dataclasses import dataclass
-from .RegToNfaUtils import process_regex, isoperation
+from .NFA import NFA, EPSILON
+from .Alphabet import CharSet
+from dataclasses import dataclass, field, fields
+from itertools import takewhile
+from .RegToNfaUtils import process_regex, repetition_bounds, CLASS, OPERATOR
 
 class Regex:
-    # static variable for naming the states
-    name_state = 0
     def thompson(self) -> NFA[int]:
-        raise NotImplementedError('the thompson method of the Regex class should never be called')
+        """
+            Creates the NFA of the regex using Thompson algorithm. All the
+        fragments are added to a single NFABuilder, so the construction
+        is linear in the size of the regex. Every NFA has its own states,
+        numbered from 0
+        Returns:
+            the NFA
+        """
+        builder = NFABuilder(0)
+        (start, final) = builder.build(self)
+        return builder.nfa(start, final)
+
+    def glushkov(self) -> NFA[int]:
+        """
+            Creates the NFA of the regex using Glushkov algorithm (the position
+        automaton). Every character or class of the regex is a position; the
+        first, last and follow sets of the positions give an NFA without
+        epsilon transitions, with a state for every position and the initial
+        state 0
+        Returns:
+            the NFA
+        """
+        builder = PositionBuilder()
+        return builder.nfa(builder.build(self))
+
+    def simplify(self) -> 'Regex':
+        """
+            An equivalent regex that is smaller or the same: repeated alternatives
+        are removed, the single characters and classes of a union become one class,
+        the common prefixes of the alternatives are factored and the nested
+        stars are collapsed
+        Returns:
+            the simplified regex
+        """
+        return Simplifier().simplify(self)
+
+    def simplified(self, *operands: 'Regex') -> 'Regex':
+        # the node with its simplified operands, or a simpler equivalent node
+        return self
+
+    def children(self) -> tuple['Regex', ...]:
+        # the operands of the regex
+        return ()
+
+    def postorder(self) -> list['Regex']:
+        """
+            The nodes of the regex with every node after its operands, found
+        without recursion, so very long regexes can not overflow the stack
+        Returns:
+            the list of nodes
+        """
+        order = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node.children())
+        order.reverse()
+        return order
+
+    def build(self, builder: 'NFABuilder', *fragments: tuple[int, int]) -> tuple[int, int]:
+        # adds the fragment of the regex to the builder, given the fragments of its operands
+        raise NotImplementedError('the build method of the Regex class should never be called')
+
+    def positions(self, builder: 'PositionBuilder', *operands: 'Positions') -> 'Positions':
+        # adds the positions of the regex to the builder, given the positions of its operands
+        raise NotImplementedError('the positions method of the Regex class should never be called')
+
+@dataclass
+class NFABuilder:
+    """
+        The states and transitions of an NFA that is being built. Every Regex
+    adds its own fragment (a start and a final state) to it, instead of copying
+    the NFAs of its operands
+    """
+    next_state: int
+    first_state: int = field(init=False)
+    S: set[str | CharSet] = field(default_factory=set)
+    d: dict[tuple[int, str | CharSet], set[int]] = field(default_factory=dict)
+
+    # the states of the operands of the node that is being built,
+    # so a node can copy the fragments of its operands
+    operand_states: range = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.first_state = self.next_state
+        self.operand_states = range(self.next_state, self.next_state)
+
+    def new_state(self) -> int:
+        state = self.next_state
+        self.next_state += 1
+        return state
+
+    def add(self, state: int, symbol: str | CharSet, next_state: int) -> None:
+        if symbol != EPSILON:
+            self.S.add(symbol)
+        if (state, symbol) in self.d:
+            self.d[(state, symbol)].add(next_state)
+        else:
+            self.d[(state, symbol)] = {next_state}
+
+    def build(self, regex: Regex) -> tuple[int, int]:
+        # a single postfix pass over the regex: every node is built
+        # from the fragments of its operands, which are on top of the stack
+        fragments = []
+        # the first state of every fragment on the stack: the states of an operand
+        # are numbered together, so the states of a node are the ones from the
+        # first state of its first operand up to the current next_state
+        first_states = []
+        for node in regex.postorder():
+            count = len(node.children())
+            operands = fragments[len(fragments) - count:]
+            first_state = first_states[len(first_states) - count] if count else self.next_state
+            del fragments[len(fragments) - count:]
+            del first_states[len(first_states) - count:]
+            self.operand_states = range(first_state, self.next_state)
+            fragments.append(node.build(self, *operands))
+            first_states.append(first_state)
+        return fragments.pop()
+
+    def operand_transitions(self) -> list[tuple[tuple[int, str | CharSet], set[int]]]:
+        # the transitions from the states of the operands: none of these states existed
+        # before the operands were built, so they are the last transitions that were added
+        states = self.operand_states
+        return list(takewhile(lambda item: item[0][0] in states, reversed(self.d.items())))
+
+    def copy(self, states: range, transitions: list[tuple[tuple[int, str | CharSet], set[int]]],
+             fragment: tuple[int, int]) -> tuple[int, int]:
+        # adds a copy of a finished fragment, made of the given states and transitions;
+        # the copy gets new states, in the same order
+        offset = self.next_state - states.start
+        self.next_state += len(states)
+        for (state, symbol), next_states in transitions:
+            self.d[(state + offset, symbol)] = {next_state + offset for next_state in next_states}
+        (start, final) = fragment
+        return (start + offset, final + offset)
+
+    def nfa(self, start: int, final: int) -> NFA[int]:
+        return NFA(self.S, set(range(self.first_state, self.next_state)), start, self.d, {final})
+
+@dataclass
+class Positions:
+    """
+        The positions of a regex that can start and end its words, and
+    whether it matches the empty word. The sets are reused by the nodes
+    above it, so they belong to a single node at a time
+    """
+    nullable: bool
+    first: set[int]
+    last: set[int]
+
+@dataclass
+class PositionBuilder:
+    """
+        The positions of a regex that is being turned into a Glushkov NFA:
+    the label of every position and the positions that can follow it.
+    The positions are numbered from 1, state 0 is the initial state
+    """
+    labels: list[str | CharSet] = field(default_factory=lambda: [EPSILON])
+    follow: list[set[int]] = field(default_factory=lambda: [set()])
+    # the positions of the operands of the node that is being built
+    operand_positions: range = range(1, 1)
+
+    def new_position(self, label: str | CharSet) -> Positions:
+        position = len(self.labels)
+        self.labels.append(label)
+        self.follow.append(set())
+        return Positions(False, {position}, {position})
+
+    def build(self, regex: Regex) -> Positions:
+        # the same postfix pass as NFABuilder.build
+        operands_stack = []
+        first_positions = []
+        for node in regex.postorder():
+            count = len(node.children())
+            operands = operands_stack[len(operands_stack) - count:]
+            first_position = first_positions[len(first_positions) - count] if count else len(self.labels)
+            del operands_stack[len(operands_stack) - count:]
+            del first_positions[len(first_positions) - count:]
+            self.operand_positions = range(first_position, len(self.labels))
+            operands_stack.append(node.positions(self, *operands))
+            first_positions.append(first_position)
+        return operands_stack.pop()
+
+    def concat(self, first: Positions, second: Positions) -> Positions:
+        for position in first.last:
+            self.follow[position] |= second.first
+        if first.nullable:
+            first.first |= second.first
+        if second.nullable:
+            second.last |= first.last
+        return Positions(first.nullable and second.nullable, first.first, second.last)
+
+    def union(self, first: Positions, second: Positions) -> Positions:
+        first.first |= second.first
+        first.last |= second.last
+        return Positions(first.nullable or second.nullable, first.first, first.last)
+
+    def plus(self, positions: Positions) -> Positions:
+        # the words can start over after every last position
+        for position in positions.last:
+            self.follow[position] |= positions.first
+        return positions
+
+    def optional(self, positions: Positions) -> Positions:
+        return Positions(True, positions.first, positions.last)
+
+    def copy(self, positions: Positions) -> Positions:
+        # adds a copy of the finished positions of the operands, with new position numbers
+        offset = len(self.labels) - self.operand_positions.start
+        for position in self.operand_positions:
+            self.labels.append(self.labels[position])
+            self.follow.append({next_position + offset for next_position in self.follow[position]})
+        return Positions(positions.nullable,
+                         {position + offset for position in positions.first},
+                         {position + offset for position in positions.last})
+
+    def nfa(self, positions: Positions) -> NFA[int]:
+        d = {}
+        for state, next_positions in enumerate(self.follow):
+            if state == 0:
+                # the initial state goes into the first positions
+                next_positions = positions.first
+            for position in next_positions:
+                d.setdefault((state, self.labels[position]), set()).add(position)
+        final_states = set(positions.last)
+        if positions.nullable:
+            final_states.add(0)
+        return NFA(set(self.labels[1:]), set(range(len(self.labels))), 0, d, final_states)
+
+class Simplifier:
+    def __init__(self) -> None:
+        # every node that has been seen gets a key, the same for equal regexes,
+        # so repeated alternatives and common prefixes are found with dictionaries
+        self.ids = {}
+        self.keys = {}
+        # the nodes stay alive, so their ids are not reused
+        self.nodes = []
+
+    def key(self, node: Regex) -> int:
+        # the operands get their keys first, with a stack instead of recursion;
+        # the nodes that already have a key are not visited again
+        stack = [node]
+        while stack:
+            top = stack[-1]
+            if id(top) in self.keys:
+                stack.pop()
+                continue
+            missing = [child for child in top.children() if id(child) not in self.keys]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            values = tuple(getattr(top, item.name) for item in fields(top)
+                           if not isinstance(getattr(top, item.name), Regex))
+            description = (type(top), values, tuple(self.keys[id(child)] for child in top.children()))
+            self.keys[id(top)] = self.ids.setdefault(description, len(self.ids))
+            self.nodes.append(top)
+        return self.keys[id(node)]
+
+    def simplify(self, regex: Regex) -> Regex:
+        # a postfix pass like NFABuilder.build. the alternatives of nested unions are
+        # gathered in a single list and simplified together when the whole union is known
+        stack = []
+        for node in regex.postorder():
+            count = len(node.children())
+            operands = stack[len(stack) - count:]
+            del stack[len(stack) - count:]
+            if isinstance(node, Union):
+                (first, second) = [operand if isinstance(operand, list) else [operand] for operand in operands]
+                if len(first) >= len(second):
+                    first.extend(second)
+                    stack.append(first)
+                else:
+                    second[:0] = first
+                    stack.append(second)
+                continue
+            operands = [self.union(operand) if isinstance(operand, list) else operand for operand in operands]
+            simplified = node.simplified(*operands)
+            # the operands already have their keys, so this only describes the new node
+            self.key(simplified)
+            stack.append(simplified)
+        result = stack.pop()
+        return self.union(result) if isinstance(result, list) else result
+
+    def factors(self, regex: Regex) -> list[Regex]:
+        # the regexes of a chain of concatenations, in order
+        factors = []
+        stack = [regex]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Concat):
+                stack.append(node.second_concat)
+                stack.append(node.first_concat)
+            elif not (isinstance(node, Character) and node.character == EPSILON):
+                factors.append(node)
+        return factors
+
+    def concat(self, factors: list[Regex]) -> Regex:
+        if not factors:
+            return Character(EPSILON)
+        regex = factors[0]
+        for factor in factors[1:]:
+            regex = Concat(regex, factor)
+        return regex
+
+    def union(self, alternatives: list[Regex]) -> Regex:
+        return self.alternatives([self.factors(alternative) for alternative in alternatives])
+
+    def alternatives(self, sequences: list[list[Regex]]) -> Regex:
+        # the union of the concatenations of the sequences. the sequences are put in a trie
+        # keyed by their factors, so the repeated ones end in the same node and the ones that
+        # start the same way share their first regexes: ab|ac = a(b|c).
+        # a trie node is a list [ends, {key: (factor, child index)}]
+        trie = [[False, {}]]
+        for sequence in sequences:
+            node = trie[0]
+            for factor in sequence:
+                key = self.key(factor)
+                if key not in node[1]:
+                    node[1][key] = (factor, len(trie))
+                    trie.append([False, {}])
+                node = trie[node[1][key][1]]
+            node[0] = True
+        # the children are added after their parents, so going backwards every child is done
+        # before its parent. the result of a node is the sequence of the regexes that follow it,
+        # reversed so a parent adds its factor at the end
+        results = [None] * len(trie)
+        for index in range(len(trie) - 1, -1, -1):
+            (ends, children) = trie[index]
+            alternatives = []
+            intervals = []
+            for (factor, child) in children.values():
+                tail = results[child]
+                results[child] = None
+                if not tail and isinstance(factor, Character):
+                    intervals.append((ord(factor.character), ord(factor.character)))
+                elif not tail and isinstance(factor, Sugar):
+                    intervals.extend(CharSet.parse(factor.sugar).intervals)
+                else:
+                    tail.append(factor)
+                    alternatives.append(tail)
+            if len(alternatives) == 1 and not intervals and not ends:
+                # a single way to go on, the chain of factors continues
+                results[index] = alternatives[0]
+                continue
+            alternatives = [self.concat(alternative[::-1]) for alternative in alternatives]
+            # the single characters and classes become one class
+            if len(intervals) == 1 and intervals[0][0] == intervals[0][1]:
+                alternatives.append(Character(chr(intervals[0][0])))
+            elif intervals:
+                alternatives.append(Sugar(str(CharSet.of(intervals))))
+            if not alternatives:
+                results[index] = []
+                continue
+            # a balanced tree of unions, so the nfa does not get long chains of epsilon transitions
+            while len(alternatives) > 1:
+                alternatives = [Union(alternatives[position], alternatives[position + 1])
+                                if position + 1 < len(alternatives) else alternatives[position]
+                                for position in range(0, len(alternatives), 2)]
+            regex = alternatives[0]
+            if ends:
+                regex = Optional(regex).simplified(regex)
+            results[index] = [regex]
+        return self.concat(results[0][::-1])
 
 def parse_regex(regex: str) -> Regex:
     """
@@ -22,220 +386,318 @@ def parse_regex(regex: str) -> Regex:
     queue = process_regex(regex)
     if not queue:
         return Character('')
-    # an intermediate list containing different languages on which
+    # an intermediate list containing the regexes on which
     # an operation will be applied
-    nfas = []
-    for character in queue:
-        if character[0] == '[':
+    regexes = []
+    for (kind, value) in queue:
+        if kind == CLASS:
             # syntactic sugar case
-            nfas.append(Sugar(character))
-        elif character[0] == '\\':
-            # special symbols case
-            nfas.append(Character(character[1]))
-        elif not isoperation(character):
-            nfas.append(Character(character))
-        elif character == '|':
-            second_nfa = nfas.pop()
-            first_nfa = nfas.pop()
-            nfas.append(Union(first_nfa.thompson(), second_nfa.thompson()))
-        elif character == '*':
-            nfa = nfas.pop()
-            nfas.append(Kleene(nfa.thompson()))
-        elif character == '&':
-            second_nfa = nfas.pop()
-            first_nfa = nfas.pop()
-            nfas.append(Concat(first_nfa.thompson(), second_nfa.thompson()))
-        elif character == '+':
+            regexes.append(Sugar(value))
+        elif kind != OPERATOR:
+            # characters and special symbols
+            regexes.append(Character(value))
+        elif value == '|':
+            second_regex = regexes.pop()
+            first_regex = regexes.pop()
+            regexes.append(Union(first_regex, second_regex))
+        elif value == '*':
+            regexes.append(Kleene(regexes.pop()))
+        elif value == '&':
+            second_regex = regexes.pop()
+            first_regex = regexes.pop()
+            regexes.append(Concat(first_regex, second_regex))
+        elif value == '+':
             # plus sign means at least once
-            # this can be seen as a concatenation
-            # between the languange itself and
-            # kleene star applied on that language
-            nfa = nfas.pop()
-            nfas.append(Concat(nfa.thompson(), Kleene(nfa.thompson()).thompson()))
-        elif character == '?':
-            nfa = nfas.pop()
-            nfas.append(Optional(nfa.thompson()))
-    return nfas.pop()
+            regexes.append(Plus(regexes.pop()))
+        elif value == '?':
+            regexes.append(Optional(regexes.pop()))
+        elif value.startswith('{'):
+            # counted repetition {m}, {m,} or {m,n}
+            (minimum, maximum) = repetition_bounds(value)
+            regexes.append(Repeat(regexes.pop(), minimum, maximum))
+    return regexes.pop()
 
 @dataclass
 class Character(Regex):
     character: chr
-    def thompson(self) -> NFA[int]:
+    def build(self, builder: NFABuilder, *fragments: tuple[int, int]) -> tuple[int, int]:
         """
-            Creates the NFA object for a Character object using Thompson
+            Adds the NFA fragment of a Character object using Thompson
         algorithm
         Returns:
-            the NFA
+            the start and the final state of the fragment
         """
-        symbols = set()
-        kStates = set()
-        q0State = -1
-        finalStates = set()
-        d = {}
-        symbols.add(self.character)
-        Regex.name_state += 1
-        first_state = Regex.name_state
-        kStates.add(first_state)
-        Regex.name_state += 1
-        second_state = Regex.name_state
-        kStates.add(second_state)
-        q0State = first_state
-        finalStates.add(second_state)
-        d[(first_state, self.character)] = set([second_state])
-        return NFA(symbols, kStates, q0State, d, finalStates)
+        first_state = builder.new_state()
+        second_state = builder.new_state()
+        builder.add(first_state, self.character, second_state)
+        return (first_state, second_state)
+
+    def positions(self, builder: PositionBuilder, *operands: Positions) -> Positions:
+        if self.character == EPSILON:
+            # the empty regex, it has no positions
+            return Positions(True, set(), set())
+        return builder.new_position(self.character)
     
 @dataclass
 class Concat(Regex):
-    first_concat: NFA[int]
-    second_concat: NFA[int]
+    first_concat: Regex
+    second_concat: Regex
     
-    def thompson(self) -> NFA[int]:
+    def children(self) -> tuple[Regex, ...]:
+        return (self.first_concat, self.second_concat)
+
+    def build(self, builder: NFABuilder, first: tuple[int, int], second: tuple[int, int]) -> tuple[int, int]:
         """
-            Creates the NFA object for a Concatenation between two languages 
+            Adds the NFA fragment of a Concatenation between two languages 
         using Thompson algorithm
         Returns:
-            the NFA
+            the start and the final state of the fragment
         """
-        symbols = set().union(self.first_concat.S, self.second_concat.S)
-        kStates = set().union(self.first_concat.K, self.second_concat.K)
-        q0State = self.first_concat.q0
-        finalStates = set(self.second_concat.F)
-        d = {}
-        d.update(self.first_concat.d)
-        d.update(self.second_concat.d)
-        for final in self.first_concat.F:
-            d[(final, '')] = set(([self.second_concat.q0]))
-        return NFA(symbols, kStates, q0State, d, finalStates)
+        (first_start, first_final) = first
+        (second_start, second_final) = second
+        builder.add(first_final, EPSILON, second_start)
+        return (first_start, second_final)
+
+    def positions(self, builder: PositionBuilder, first: Positions, second: Positions) -> Positions:
+        return builder.concat(first, second)
+
+    def simplified(self, first: Regex, second: Regex) -> Regex:
+        if isinstance(first, Character) and first.character == EPSILON:
+            return second
+        if isinstance(second, Character) and second.character == EPSILON:
+            return first
+        return Concat(first, second)
     
 @dataclass
 class Union(Regex):
-    first_union: NFA[int]
-    second_union: NFA[int]
+    first_union: Regex
+    second_union: Regex
     
-    def thompson(self) -> NFA[int]:
+    def children(self) -> tuple[Regex, ...]:
+        return (self.first_union, self.second_union)
+
+    def build(self, builder: NFABuilder, first: tuple[int, int], second: tuple[int, int]) -> tuple[int, int]:
         """
-            Creates the NFA object for a Union between two languages 
+            Adds the NFA fragment of a Union between two languages 
         using Thompson algorithm
         Returns:
-            the NFA
+            the start and the final state of the fragment
         """
-        symbols = set().union(self.first_union.S, self.second_union.S)
-        kStates = set().union(self.first_union.K, self.second_union.K)
-        finalStates = set(self.second_union.F)
-        d = {}
-        d.update(self.first_union.d)
-        d.update(self.second_union.d)
-        Regex.name_state += 1
-        first_state = Regex.name_state
-        kStates.add(first_state)
-        Regex.name_state += 1
-        second_state = Regex.name_state
-        kStates.add(second_state)
-        q0State = first_state
-        finalStates.add(second_state)
-        for final in self.first_union.F:
-            d[(final, '')] = set([second_state])
-        for final in self.second_union.F:
-            d[(final, '')] = set([second_state])
-        d[(first_state, '')] = set([self.first_union.q0])
-        d[(first_state, '')].add(self.second_union.q0)
-        return NFA(symbols, kStates, q0State, d, finalStates)
+        (first_start, first_final) = first
+        (second_start, second_final) = second
+        first_state = builder.new_state()
+        second_state = builder.new_state()
+        builder.add(first_state, EPSILON, first_start)
+        builder.add(first_state, EPSILON, second_start)
+        builder.add(first_final, EPSILON, second_state)
+        builder.add(second_final, EPSILON, second_state)
+        return (first_state, second_state)
+
+    def positions(self, builder: PositionBuilder, first: Positions, second: Positions) -> Positions:
+        return builder.union(first, second)
 
 @dataclass    
 class Kleene(Regex):
-    nfa: NFA[int]
+    regex: Regex
     
-    def thompson(self) -> NFA[int]:
+    def children(self) -> tuple[Regex, ...]:
+        return (self.regex,)
+
+    def build(self, builder: NFABuilder, fragment: tuple[int, int]) -> tuple[int, int]:
         """
-            Creates the NFA object for a language on which is applied Kleene Star 
+            Adds the NFA fragment of a language on which is applied Kleene Star 
         using Thompson algorithm
         Returns:
-            the NFA
+            the start and the final state of the fragment
         """
-        symbols = set().union(self.nfa.S)
-        kStates = set().union(self.nfa.K)
-        finalStates = set()
-        d = {}
-        d.update(self.nfa.d)
-        Regex.name_state += 1
-        first_state = Regex.name_state
-        kStates.add(first_state)
-        Regex.name_state += 1
-        second_state = Regex.name_state
-        kStates.add(second_state)
-        q0State = first_state
-        finalStates.add(second_state)
-        for final in self.nfa.F:
-            d[(final, '')] = set([self.nfa.q0])
-            d[(final, '')].add(second_state)
-        d[(first_state, '')] = set([self.nfa.q0])
-        d[(first_state, '')].add(second_state)
-        return NFA(symbols, kStates, q0State, d, finalStates)
+        (start, final) = fragment
+        first_state = builder.new_state()
+        second_state = builder.new_state()
+        builder.add(final, EPSILON, start)
+        builder.add(final, EPSILON, second_state)
+        builder.add(first_state, EPSILON, start)
+        builder.add(first_state, EPSILON, second_state)
+        return (first_state, second_state)
+
+    def positions(self, builder: PositionBuilder, operand: Positions) -> Positions:
+        return builder.optional(builder.plus(operand))
+
+    def simplified(self, regex: Regex) -> Regex:
+        # a** = a+* = a?* = a*
+        if isinstance(regex, (Kleene, Plus, Optional)):
+            return Kleene(regex.regex)
+        if isinstance(regex, Character) and regex.character == EPSILON:
+            return regex
+        return Kleene(regex)
+
+@dataclass    
+class Plus(Regex):
+    regex: Regex
+    
+    def children(self) -> tuple[Regex, ...]:
+        return (self.regex,)
+
+    def build(self, builder: NFABuilder, fragment: tuple[int, int]) -> tuple[int, int]:
+        """
+            Adds the NFA fragment of a language on which is applied Plus
+        (at least once) using Thompson algorithm. The language is built only
+        once, with an epsilon transition from its end back to its start
+        Returns:
+            the start and the final state of the fragment
+        """
+        (start, final) = fragment
+        second_state = builder.new_state()
+        builder.add(final, EPSILON, start)
+        builder.add(final, EPSILON, second_state)
+        return (start, second_state)
+
+    def positions(self, builder: PositionBuilder, operand: Positions) -> Positions:
+        return builder.plus(operand)
+
+    def simplified(self, regex: Regex) -> Regex:
+        # a*+ = a*, a++ = a+, a?+ = a*
+        if isinstance(regex, (Kleene, Plus)):
+            return regex
+        if isinstance(regex, Optional):
+            return Kleene(regex.regex)
+        if isinstance(regex, Character) and regex.character == EPSILON:
+            return regex
+        return Plus(regex)
 
 @dataclass
 class Optional(Regex):
-    nfa: NFA[int]
+    regex: Regex
     
-    def thompson(self) -> NFA[int]:
+    def children(self) -> tuple[Regex, ...]:
+        return (self.regex,)
+
+    def build(self, builder: NFABuilder, fragment: tuple[int, int]) -> tuple[int, int]:
         """
-            Creates the NFA object for a language on which is applied *Optional 
+            Adds the NFA fragment of a language on which is applied *Optional 
         using Thompson algorithm
         
         *Optional = Once Or Never
         
         Returns:
-            the NFA
+            the start and the final state of the fragment
         """
-        symbols = set().union(self.nfa.S)
-        kStates = set().union(self.nfa.K)
-        finalStates = set(self.nfa.F)
-        d = {}
-        d.update(self.nfa.d)
-        Regex.name_state += 1
-        first_state = Regex.name_state
-        kStates.add(first_state)
-        Regex.name_state += 1
-        second_state = Regex.name_state
-        kStates.add(second_state)
-        q0State = first_state
-        finalStates.add(second_state)
-        for final in self.nfa.F:
-            d[(final, '')] = set([second_state])
-        d[(first_state, '')] = set([self.nfa.q0])
-        d[(first_state, '')].add(second_state)
-        return NFA(symbols, kStates, q0State, d, finalStates)
+        (start, final) = fragment
+        first_state = builder.new_state()
+        second_state = builder.new_state()
+        builder.add(final, EPSILON, second_state)
+        builder.add(first_state, EPSILON, start)
+        builder.add(first_state, EPSILON, second_state)
+        return (first_state, second_state)
+
+    def positions(self, builder: PositionBuilder, operand: Positions) -> Positions:
+        return builder.optional(operand)
+
+    def simplified(self, regex: Regex) -> Regex:
+        # a*? = a*, a?? = a?, a+? = a*
+        if isinstance(regex, (Kleene, Optional)):
+            return regex
+        if isinstance(regex, Plus):
+            return Kleene(regex.regex)
+        if isinstance(regex, Character) and regex.character == EPSILON:
+            return regex
+        return Optional(regex)
+
+@dataclass
+class Repeat(Regex):
+    regex: Regex
+    minimum: int
+    maximum: int | None
+
+    def children(self) -> tuple[Regex, ...]:
+        return (self.regex,)
+
+    def build(self, builder: NFABuilder, fragment: tuple[int, int]) -> tuple[int, int]:
+        """
+            Adds the NFA fragment of a language repeated between minimum and
+        maximum times (with no maximum, at least minimum times). The language
+        is built only once and the other copies are made from its transitions,
+        chained one after the other. Every copy from the minimum on can go to
+        the final state, so the optional copies are nested (a(a(a)?)?) and the
+        DFA stays linear in the number of copies
+        Returns:
+            the start and the final state of the fragment
+        """
+        states = builder.operand_states
+        transitions = builder.operand_transitions()
+        count = self.maximum if self.maximum is not None else max(self.minimum, 1)
+        if count == 0:
+            # only the empty word
+            first_state = builder.new_state()
+            second_state = builder.new_state()
+            builder.add(first_state, EPSILON, second_state)
+            return (first_state, second_state)
+        copies = [fragment] + [builder.copy(states, transitions, fragment) for _ in range(count - 1)]
+        final_state = builder.new_state()
+        for (_, final), (next_start, _) in zip(copies, copies[1:]):
+            builder.add(final, EPSILON, next_start)
+        for (start, final) in copies[max(self.minimum, 1) - 1:]:
+            builder.add(final, EPSILON, final_state)
+        if self.maximum is None:
+            # the last copy can be repeated any number of times
+            (start, final) = copies[-1]
+            builder.add(final, EPSILON, start)
+        if self.minimum == 0:
+            # the start of the operand may be entered again from inside it, so the
+            # empty word needs a new start state to skip the copies from
+            first_state = builder.new_state()
+            builder.add(first_state, EPSILON, copies[0][0])
+            builder.add(first_state, EPSILON, final_state)
+            return (first_state, final_state)
+        return (copies[0][0], final_state)
+
+    def positions(self, builder: PositionBuilder, operand: Positions) -> Positions:
+        # the same nesting as build, made of copies of the positions of the operand
+        count = self.maximum if self.maximum is not None else max(self.minimum, 1)
+        if count == 0:
+            return Positions(True, set(), set())
+        copies = [operand] + [builder.copy(operand) for _ in range(count - 1)]
+        tail = copies[-1]
+        if self.maximum is None:
+            tail = builder.plus(tail)
+        for index in range(count - 2, -1, -1):
+            if index + 1 >= self.minimum:
+                tail = builder.optional(tail)
+            tail = builder.concat(copies[index], tail)
+        if self.minimum == 0:
+            tail = builder.optional(tail)
+        return tail
+
+    def simplified(self, regex: Regex) -> Regex:
+        if self.maximum == 0 or (isinstance(regex, Character) and regex.character == EPSILON):
+            return Character(EPSILON)
+        match (self.minimum, self.maximum):
+            case (0, None):
+                return Kleene(regex).simplified(regex)
+            case (1, None):
+                return Plus(regex).simplified(regex)
+            case (0, 1):
+                return Optional(regex).simplified(regex)
+            case (1, 1):
+                return regex
+        return Repeat(regex, self.minimum, self.maximum)
 
 @dataclass    
 class Sugar(Regex):
     sugar: str
     
-    def thompson(self) -> NFA[int]:
+    def build(self, builder: NFABuilder, *fragments: tuple[int, int]) -> tuple[int, int]:
         """
-            Creates the NFA object for a syntactic sugar language
-        using Thompson algorithm
+            Adds the NFA fragment of a character class using Thompson
+        algorithm. The whole class is a single transition labelled with its
+        ranges of characters, so wide classes do not add more transitions
         
         Returns:
-            the NFA
+            the start and the final state of the fragment
         """
-        symbols = set()
-        kStates = set()
-        q0State = -1
-        finalStates = set()
-        d = {}
-        Regex.name_state += 1
-        first_state = Regex.name_state
-        kStates.add(first_state)
-        Regex.name_state += 1
-        second_state = Regex.name_state
-        kStates.add(second_state)
-        finalStates.add(second_state)
-        q0State = first_state
-        start = self.sugar[1]
-        end = self.sugar[3]
-        character = start
-        # create transitions for all characters from the syntactic sugar
-        while character <= end:
-            symbols.add(character)
-            d[(first_state, character)] = set([second_state])
-            character = chr(ord(character) + 1)
-        return NFA(symbols, kStates, q0State, d, finalStates)
+        first_state = builder.new_state()
+        second_state = builder.new_state()
+        builder.add(first_state, CharSet.parse(self.sugar), second_state)
+        return (first_state, second_state)
+
+    def positions(self, builder: PositionBuilder, *operands: Positions) -> Positions:
+        return builder.new_position(CharSet.parse(self.sugar))
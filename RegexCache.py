@@ -0,0 +1,111 @@
+from collections import OrderedDict, namedtuple
+from itertools import repeat
+from threading import Lock
+
+from .NFA import NFA
+from .Regex import Regex, parse_regex
+
+# the ways a regex can be turned into an nfa
+CONSTRUCTIONS = {'thompson': Regex.thompson, 'glushkov': Regex.glushkov}
+
+# the fewest missing regexes for every worker that are compiled by a pool of processes.
+# starting a pool takes about 5 ms for each worker and a regex of a lexer rule is compiled
+# in about 0.3 ms, so a pool is slower than compiling in this process for smaller batches
+PARALLEL_RULES = 100
+
+
+def build_nfa(regex: str, construction: str = 'thompson') -> NFA[int]:
+    # the nfa of a regex without epsilon transitions and useless states, with its states
+    # numbered from 0. it only depends on its arguments, so it can run in a worker process
+    return CONSTRUCTIONS[construction](parse_regex(regex).simplify()).remove_epsilons().trim()
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'size', 'max_size', 'entries'])
+
+
+class RegexCache:
+    def __init__(self, max_size: int = 200000, parallel_rules: int = PARALLEL_RULES) -> None:
+        # the reduced nfas of the simplified regexes, keyed by the text of the regex and the construction, with the least
+        # recently used ones evicted first. the size of an entry is the number of its states
+        # and transitions, and the total size of the entries is kept under max_size.
+        # the nfas are shared between the users of the cache, so they must not be modified.
+        # get_all only starts a pool for at least parallel_rules missing regexes for every worker
+        self.max_size = max_size
+        self.parallel_rules = parallel_rules
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = Lock()
+
+    def get(self, regex: str, construction: str = 'thompson') -> NFA[int]:
+        key = (regex, construction)
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key][0]
+            self.misses += 1
+        # compile outside of the lock, so other threads are not blocked
+        nfa = build_nfa(regex, construction)
+        self.put(key, nfa)
+        return nfa
+
+    def get_all(self, regexes: list[str], construction: str = 'thompson', workers: int = 1) -> list[NFA[int]]:
+        # the nfas of many regexes. with more than one worker and enough regexes that are not
+        # in the cache, they are compiled by a pool of worker processes and then added to the cache.
+        # only the compilation of the regexes runs in the pool, so even then most of the build of
+        # a lexer stays in this process
+        if workers <= 1:
+            return [self.get(regex, construction) for regex in regexes]
+        compiled = {}
+        with self.lock:
+            for regex in regexes:
+                key = (regex, construction)
+                if key in self.entries:
+                    self.hits += 1
+                    self.entries.move_to_end(key)
+                    compiled[regex] = self.entries[key][0]
+        missing = [regex for regex in dict.fromkeys(regexes) if regex not in compiled]
+        if len(missing) >= max(self.parallel_rules * workers, 2):
+            # the pool is imported only when it is used, it makes every import of the lexer slower
+            from concurrent.futures import ProcessPoolExecutor
+            with self.lock:
+                self.misses += len(missing)
+            # a few chunks for every worker, so they are kept busy without sending every regex alone
+            chunk_size = max(1, len(missing) // (workers * 4))
+            with ProcessPoolExecutor(min(workers, len(missing))) as pool:
+                nfas = list(pool.map(build_nfa, missing, repeat(construction), chunksize=chunk_size))
+            for regex, nfa in zip(missing, nfas):
+                self.put((regex, construction), nfa)
+                compiled[regex] = nfa
+        return [compiled[regex] if regex in compiled else self.get(regex, construction) for regex in regexes]
+
+    def put(self, key: tuple[str, str], nfa: NFA[int]) -> None:
+        size = len(nfa.K) + sum(len(next_states) for next_states in nfa.d.values())
+        with self.lock:
+            if key not in self.entries and size <= self.max_size:
+                self.entries[key] = (nfa, size)
+                self.size += size
+                while self.size > self.max_size:
+                    (_, (_, evicted_size)) = self.entries.popitem(last=False)
+                    self.size -= evicted_size
+                    self.evictions += 1
+
+    def info(self) -> CacheInfo:
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, self.size, self.max_size, len(self.entries))
+
+    def clear(self) -> None:
+        # remove all the entries and reset the statistics
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+# the cache used by the lexers
+regex_cache = RegexCache()
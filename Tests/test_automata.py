@@ -0,0 +1,155 @@
+import unittest
+
+from src.Alphabet import Alphabet, CharSet
+from src.DFA import DEAD, DFA
+from src.NFA import NFA
+
+
+class AutomataTests(unittest.TestCase):
+    def test_compiled_table(self):
+        # (ab)*, with a state that can not reach the final state anymore
+        dfa = DFA(
+            {'a', 'b'},
+            {0, 1, 2, 3},
+            0,
+            {
+                (0, 'a'): 1,
+                (0, 'b'): 2,
+                (1, 'a'): 3,
+                (1, 'b'): 0,
+                (2, 'a'): 2,
+                (2, 'b'): 2,
+                (3, 'a'): 3,
+                (3, 'b'): 2,
+            },
+            {0},
+        )
+
+        table = dfa.compile()
+
+        # the two states that can not reach 0 are merged into the dead state
+        self.assertEqual(len(table.table), 3)
+        self.assertEqual(table.table[table.start][table.classes['b']], DEAD)
+        for word, ref in [('', True), ('ab', True), ('abab', True), ('aba', False),
+                          ('ba', False), ('abc', False)]:
+            self.assertEqual(table.accept(word), ref)
+            self.assertEqual(dfa.accept(word), ref)
+
+    def test_compiled_subset_construction(self):
+        nfa = NFA({'a', 'b'}, {0, 1, 2}, 0, {(0, ''): {1}, (1, 'a'): {1, 2}, (2, 'b'): {0}}, {2})
+
+        dfa = nfa.subset_construction()
+
+        self.assertEqual(dfa.subsets[dfa.q0], frozenset({0, 1}))
+        for word, ref in [('a', True), ('aa', True), ('aba', True), ('ab', False), ('', False)]:
+            self.assertEqual(dfa.accept(word), ref)
+
+    def test_minimize(self):
+        # a(b|c)* with the states after b and after c kept apart
+        dfa = DFA(
+            {'a', 'b', 'c'},
+            {0, 1, 2, 3},
+            0,
+            {
+                (0, 'a'): 1,
+                (1, 'b'): 2,
+                (1, 'c'): 3,
+                (2, 'b'): 2,
+                (2, 'c'): 3,
+                (3, 'b'): 2,
+                (3, 'c'): 3,
+            },
+            {1, 2, 3},
+        )
+
+        minimal = dfa.minimize()
+
+        # 0, the merged final states and the sink for the missing transitions
+        self.assertEqual(len(minimal.K), 3)
+        self.assertIn(frozenset({1, 2, 3}), minimal.subsets.values())
+        for word, ref in [('a', True), ('abcb', True), ('', False), ('b', False), ('aa', False)]:
+            self.assertEqual(minimal.accept(word), ref)
+
+    def test_minimize_with_key(self):
+        dfa = DFA({'a'}, {0, 1, 2}, 0, {(0, 'a'): 1, (1, 'a'): 2, (2, 'a'): 2}, {1, 2})
+
+        self.assertEqual(len(dfa.minimize().K), 2)
+        # 1 and 2 are equivalent, unless the key keeps them apart
+        self.assertEqual(len(dfa.minimize(lambda state: state).K), 3)
+
+    def test_remap_states(self):
+        dfa = DFA({'a', 'b'}, {0, 1, 2}, 0, {(0, 'a'): 1, (0, 'b'): 2, (1, 'a'): 2, (1, 'b'): 2,
+                                             (2, 'a'): 2, (2, 'b'): 2}, {1})
+
+        remapped = dfa.remap_states(lambda state: state + 2)
+
+        self.assertEqual(remapped.K, {2, 3, 4})
+        self.assertEqual(remapped.q0, 2)
+        self.assertEqual(remapped.F, {3})
+        self.assertEqual(remapped.d[(2, 'a')], 3)
+
+    def test_renumber(self):
+        nfa = NFA({'a'}, {'x', 'y', 'z', 'w'}, 'z', {('z', ''): {'y'}, ('y', 'a'): {'x'}}, {'x'})
+
+        renumbered = nfa.renumber()
+
+        self.assertEqual(renumbered.q0, 0)
+        self.assertEqual(renumbered.K, {0, 1, 2, 3})
+        self.assertEqual(renumbered.d, {(0, ''): {1}, (1, 'a'): {2}})
+        self.assertEqual(renumbered.F, {2})
+
+        dfa = nfa.subset_construction().remap_states(lambda state: str(state)).renumber()
+        self.assertEqual(dfa.subsets[dfa.q0], frozenset({'y', 'z'}))
+        self.assertTrue(dfa.accept('a'))
+        self.assertFalse(dfa.accept('aa'))
+
+    def test_alphabet_classes(self):
+        nfa = NFA({'a', 'b', 'c', 'd'}, {0, 1, 2}, 0,
+                  {(0, 'a'): {1}, (0, 'b'): {1}, (0, 'c'): {2}, (1, 'd'): {2}, (1, 'c'): {2}}, {2})
+
+        alphabet = nfa.alphabet()
+
+        self.assertEqual(alphabet.members, [CharSet.parse('[ab]'), CharSet.parse('[c]'), CharSet.parse('[d]')])
+        self.assertEqual(alphabet.class_of('b'), 0)
+        self.assertEqual(alphabet.class_of('e'), -1)
+
+        dfa = nfa.subset_construction(alphabet)
+        self.assertEqual(dfa.S, {0, 1, 2})
+        for word, ref in [('c', True), ('ad', True), ('bc', True), ('bd', True), ('ab', False), ('e', False)]:
+            self.assertEqual(dfa.accept(word), ref)
+
+    def test_class_table(self):
+        charsets = [CharSet.parse('[a-zA-Z]'), CharSet.parse('[^a-z]'), CharSet.parse('[一-鿿]')]
+        alphabet = Alphabet.partition(((charset, index) for index, charset in enumerate(charsets)), charsets)
+        table = alphabet.table()
+
+        # the blocks that are all in one class are shared
+        self.assertLess(len(table.blocks), 8)
+        for symbol in 'aZz{é一鿿\U0010FFFF\x00😀':
+            self.assertEqual(table.class_of(symbol), alphabet.class_of(symbol), symbol)
+        self.assertEqual(table.class_of('b'), alphabet.class_of('a'))
+        self.assertEqual(table.class_of('A'), alphabet.class_of('Z'))
+
+    def test_nfa_accept(self):
+        # the same nfa as test_dfa_1 from the first homework
+        nfa = NFA({'a', 'b'}, {0, 1, 2, 3}, 0,
+                  {(0, 'a'): {1}, (0, ''): {2}, (1, 'b'): {1}, (1, 'a'): {2}, (1, ''): {3},
+                   (2, ''): {3}, (3, ''): {1}, (3, 'a'): {2}}, {2})
+
+        for word, ref in [('aaaa', True), ('bbbaaaabbaa', True), ('ababababbbbaaab', False),
+                          ('bbbbbbb', False), ('abaaaaabab', False), ('', True), ('c', False)]:
+            self.assertEqual(nfa.accept(word), ref)
+            self.assertEqual(nfa.subset_construction().accept(word), ref)
+
+    def test_remove_epsilons_and_trim(self):
+        # the same nfa as test_dfa_1 from the first homework, with a useless state 4
+        nfa = NFA({'a', 'b'}, {0, 1, 2, 3, 4}, 0,
+                  {(0, 'a'): {1}, (0, ''): {2}, (1, 'b'): {1, 4}, (1, 'a'): {2}, (1, ''): {3},
+                   (2, ''): {3}, (3, ''): {1}, (3, 'a'): {2}, (4, 'a'): {4}}, {2})
+
+        reduced = nfa.remove_epsilons().trim()
+
+        self.assertNotIn('', {symbol for _, symbol in reduced.d})
+        self.assertNotIn(4, reduced.K)
+        for word in ['', 'a', 'aa', 'ab', 'ba', 'bba', 'abab', 'bbbaaaabbaa', 'ababababbbbaaab']:
+            self.assertEqual(reduced.accept(word), nfa.accept(word), word)
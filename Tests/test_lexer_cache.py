@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.Lexer import Lexer
+from src.LexerCache import CACHE_VERSION, SOURCE_MODULES, LexerCache, source_version
+from src.Tests.test_lexer_engines import SPECS
+
+
+class LexerCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = LexerCache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_warm_start(self):
+        for options in [{}, {'engine': 'derivatives'}]:
+            for spec, words in SPECS:
+                built = self.cache.get(spec, **options)
+                self.assertTrue(os.path.exists(self.cache.path(spec, **options)))
+
+                loaded = self.cache.load(spec, **options)
+                self.assertIsNotNone(loaded)
+                for word in words:
+                    self.assertEqual(loaded.lex(word), built.lex(word), f'{options} on "{word}"')
+
+    def test_edit_cached(self):
+        # a lexer from a warm cache can be edited like a built one
+        (spec, words) = SPECS[2]
+        for options in [{}, {'engine': 'derivatives'}]:
+            self.cache.get(spec, **options)
+            lexer = self.cache.get(spec, **options)
+            self.assertIsNone(lexer.rows)
+            lexer.replace_rule('NUMBER', '[0-9]+|-[0-9]+')
+            lexer.remove_rule('CONCAT')
+            edited = [rule for rule in spec if rule[0] != 'CONCAT']
+            edited[1] = ('NUMBER', '[0-9]+|-[0-9]+')
+            reference = Lexer(edited, **options)
+            for word in words + ['(+ -1 2)']:
+                self.assertEqual(lexer.lex(word), reference.lex(word), f'{options} on "{word}"')
+
+    def test_keys(self):
+        (spec, _) = SPECS[0]
+        self.assertEqual(self.cache.key(spec), self.cache.key(list(spec)))
+        self.assertNotEqual(self.cache.key(spec), self.cache.key(spec[:-1]))
+        self.assertNotEqual(self.cache.key(spec), self.cache.key(spec, engine='derivatives'))
+        # the number of workers does not change the table
+        self.assertEqual(self.cache.key(spec), self.cache.key(spec, workers=4))
+
+    def test_broken_entry(self):
+        (spec, words) = SPECS[0]
+        with open(self.cache.path(spec), 'w') as file:
+            file.write('{"version": 2, "tab')
+
+        lexer = self.cache.get(spec)
+        self.assertEqual(lexer.lex(words[0]), [('pair', '10'), ('ones', '11'), ('pair', '01'), ('other', '1')])
+        # the broken entry was replaced
+        self.assertIsNotNone(self.cache.load(spec))
+
+    def test_unwritable_directory(self):
+        (spec, words) = SPECS[0]
+        with open(os.path.join(self.directory.name, 'file'), 'w'):
+            pass
+        cache = LexerCache(os.path.join(self.directory.name, 'file', 'cache'))
+
+        self.assertEqual(cache.get(spec).lex(words[0]), self.cache.get(spec).lex(words[0]))
+        self.assertIsNone(cache.load(spec))
+
+    def test_inconsistent_entry(self):
+        # an entry that can be read but does not fit together is built again
+        (spec, words) = SPECS[2]
+        built = self.cache.get(spec)
+        with open(self.cache.path(spec)) as file:
+            data = json.load(file)
+        for change in [lambda data: data['table'][1].pop(),
+                       lambda data: data['token_ids'].pop(),
+                       lambda data: data['final'].pop(),
+                       lambda data: data.update(start=len(data['table'])),
+                       lambda data: data['table'][1].__setitem__(0, len(data['table'])),
+                       lambda data: data['columns'].pop()]:
+            broken = json.loads(json.dumps(data))
+            change(broken)
+            with open(self.cache.path(spec), 'w') as file:
+                json.dump(broken, file)
+            self.assertIsNone(self.cache.load(spec))
+            self.assertEqual(self.cache.get(spec).lex(words[0]), built.lex(words[0]))
+
+    def test_source_version(self):
+        # a change to the source of the modules that build the tables changes the version
+        directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(source_version(directory), CACHE_VERSION)
+        for name in SOURCE_MODULES:
+            shutil.copy(os.path.join(directory, name + '.py'), self.directory.name)
+        self.assertEqual(source_version(self.directory.name), CACHE_VERSION)
+        with open(os.path.join(self.directory.name, 'Regex.py'), 'a') as file:
+            file.write('\n')
+        self.assertNotEqual(source_version(self.directory.name), CACHE_VERSION)
@@ -0,0 +1,143 @@
+import unittest
+
+from src.Lexer import Lexer
+
+
+SPECS = [
+    (
+        [("ones", "11+"), ("pair", "01|10"), ("other", "0|1")],
+        ["1011011", "10101", "1001", "", "102"],
+    ),
+    (
+        [
+            ("SPACE", "\\ "),
+            ("NEWLINE", "\n"),
+            ("ABC", "a(b+)c"),
+            ("AS", "a+"),
+            ("BCS", "(bc)+"),
+            ("DORC", "(d|c)+"),
+        ],
+        [
+            "abbbc aaa bcbc dcdc\nabc",
+            "abcbcbcaabaad dccbca",
+            "d a\nbdbc ccddabbbc",
+            "e abbbcbcaadc c",
+            "abbc\naaabc dcccabcb",
+            "\naaa\nbabbcbcbc abbbcaabc",
+        ],
+    ),
+    (
+        [
+            ("SPACE", "\\ "),
+            ("NUMBER", "[0-9]+"),
+            ("LPARA", "("),
+            ("RPARA", "\\)"),
+            ("SUM", "\\+"),
+            ("CONCAT", "\\+\\+"),
+            ("LAMBDA", "lambda\\ +([a-z]|[A-Z])+:"),
+            ("ID", "([a-z]|[A-Z])+"),
+        ],
+        ["(+ (1 2 3) 44)", "(lambda x: (++ x x) (1 2))", "lambdax: 12", "(1 2 ;"],
+    ),
+    (
+        [
+            ("SPACE", "\\ +"),
+            ("WORD", "[a-zA-Zà-ÿΑ-ω一-鿿]+"),
+            ("EMOJI", "[😀-🙏]"),
+            ("OTHER", "[^a-zA-Z ]"),
+        ],
+        ["naïve 变量 Ωmega", "😀😁 ok", "données, ¿qué?", "\u0000 end"],
+    ),
+]
+
+
+class LexerEnginesTests(unittest.TestCase):
+    def check_engine(self, **options) -> None:
+        for spec, words in SPECS:
+            reference = Lexer(spec)
+            lexer = Lexer(spec, **options)
+            for word in words:
+                self.assertEqual(lexer.lex(word), reference.lex(word), f'{options} on "{word}"')
+
+    def test_lazy(self):
+        self.check_engine(engine='lazy')
+
+    def test_lazy_small_cache(self):
+        # the cache is flushed all the time, so the lazy dfa ends up simulating the nfa
+        self.check_engine(engine='lazy', cache_size=4)
+
+    def test_lazy_single_flush(self):
+        # the cache fills up once and the rest of the input fits in it, so it is not thrashing
+        spec = [(f'KEYWORD{index}', f'k{index}') for index in range(60)] + [('SPACE', '\\ '), ('NUMBER', '[0-9]+')]
+        word = ' '.join(f'k{index}' for index in range(60)) + ' 1' * 2000
+        lexer = Lexer(spec, engine='lazy', cache_size=50)
+        self.assertEqual(lexer.lex(word), Lexer(spec).lex(word))
+        self.assertEqual(lexer.runner.flushes, 1)
+        self.assertFalse(lexer.runner.simulating)
+
+    def test_nfa(self):
+        self.check_engine(engine='nfa')
+
+    def test_derivatives(self):
+        self.check_engine(engine='derivatives')
+
+    def test_glushkov(self):
+        self.check_engine(construction='glushkov')
+        self.check_engine(engine='lazy', construction='glushkov')
+
+    def test_token_ids(self):
+        # every row has the token of the first rule it matches, the others have -1
+        (spec, _) = SPECS[0]
+        for engine in ['dfa', 'derivatives']:
+            lexer = Lexer(spec, engine=engine)
+            table = lexer.table
+            for word, token in [('1', 2), ('11', 0), ('10', 1), ('111', 0), ('0', 2)]:
+                state = table.start
+                for symbol in word:
+                    state = table.table[state][table.classes[symbol]]
+                self.assertEqual(lexer.names[lexer.token_ids[state]], spec[token][0], f'{engine} on "{word}"')
+            self.assertEqual(lexer.token_ids[table.start], -1)
+
+    def test_edit_rules(self):
+        # an edited lexer lexes like a lexer built from the edited spec
+        (spec, words) = SPECS[2]
+        for engine in ['dfa', 'lazy', 'nfa', 'derivatives']:
+            lexer = Lexer(spec, engine=engine)
+            lexer.add_rule('COMMENT', ';([a-z]|\\ )*')
+            lexer.replace_rule('NUMBER', '[0-9]+|-[0-9]+')
+            lexer.remove_rule('CONCAT')
+            lexer.add_rule('ARROW', '->', index=0)
+            edited = [('ARROW', '->')] + [rule for rule in spec if rule[0] != 'CONCAT'] + \
+                [('COMMENT', ';([a-z]|\\ )*')]
+            edited[2] = ('NUMBER', '[0-9]+|-[0-9]+')
+            self.assertEqual(lexer.spec, edited)
+            reference = Lexer(edited)
+            for word in words + ['(+ -1 2) ; a b', '(++ x)->-3']:
+                self.assertEqual(lexer.lex(word), reference.lex(word), f'{engine} on "{word}"')
+
+        with self.assertRaises(ValueError):
+            lexer.remove_rule('CONCAT')
+
+    def test_edit_keeps_rows(self):
+        # the other rules keep their states, and the rows that do not reach the edited rule are kept
+        (spec, words) = SPECS[2]
+        for engine in ['dfa', 'lazy']:
+            lexer = Lexer(spec, engine=engine)
+            for word in words:
+                lexer.lex(word)
+            rows = lexer.runner if engine == 'lazy' else lexer.rows
+            index = lexer.rule_index('NUMBER')
+            offsets = list(lexer.rule_offsets)
+            edited = set(lexer.rule_states(index))
+            kept = [subset for subset in rows.subsets[2:] if subset.isdisjoint(edited)]
+            dropped = [subset for subset in rows.subsets if not subset.isdisjoint(edited)]
+            self.assertTrue(kept)
+            self.assertTrue(dropped)
+            lexer.replace_rule('NUMBER', '[0-9]+|-[0-9]+')
+            self.assertEqual(lexer.rule_offsets[:index] + lexer.rule_offsets[index + 1:],
+                             offsets[:index] + offsets[index + 1:])
+            self.assertTrue(edited.isdisjoint(lexer.rule_states(index)))
+            for subset in kept:
+                self.assertIn(subset, rows.ids)
+            for subset in dropped:
+                self.assertNotIn(subset, rows.ids)
@@ -0,0 +1,54 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+from src.Lexer import Lexer
+from src.LexerCache import LexerCache
+from src.Tests.test_lexer_engines import SPECS
+
+
+def load_module(path: str):
+    module_spec = importlib.util.spec_from_file_location('generated_lexer', path)
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return module
+
+
+class LexerGeneratorTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'generated_lexer.py')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def check_module(self, lexer: Lexer, words: list[str]) -> None:
+        lexer.generate_module(self.path)
+        module = load_module(self.path)
+        for word in words:
+            self.assertEqual(module.lex(word), lexer.lex(word), f'{lexer.engine} on "{word}"')
+
+    def test_generated_lex(self):
+        for engine in ['dfa', 'derivatives']:
+            for spec, words in SPECS:
+                self.check_module(Lexer(spec, engine=engine), words + ['\n' + words[0], words[0] + '\t'])
+
+    def test_cached_lexer(self):
+        # a lexer loaded from the cache has everything the module needs
+        (spec, words) = SPECS[2]
+        cache = LexerCache(self.directory.name)
+        cache.get(spec)
+        self.check_module(cache.load(spec), words)
+
+    def test_no_table(self):
+        (spec, _) = SPECS[0]
+        with self.assertRaises(ValueError):
+            Lexer(spec, engine='lazy').generate_module(self.path)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_token_names(self):
+        # the names are written whole, even with spaces, hyphens or new lines
+        spec = [(f'TOKEN-NAME-WITH-HYPHENS {index}', f'a{index}') for index in range(10)]
+        spec.append(('TOKEN\nNAME', 'b'))
+        self.check_module(Lexer(spec), ['a3a9b', 'b', 'a0'])
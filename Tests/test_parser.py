@@ -0,0 +1,47 @@
+import tempfile
+import unittest
+from threading import Thread
+
+from src import Parser
+from src.AST import AST
+from src.LexerCache import LexerCache
+
+
+class ParserLexersTests(unittest.TestCase):
+    def setUp(self):
+        # the lexers are built into an empty cache, not the cache of the user
+        self.directory = tempfile.TemporaryDirectory()
+        self.lexer_cache = Parser.lexer_cache
+        Parser.lexer_cache = LexerCache(self.directory.name)
+        Parser.lexers.clear()
+
+    def tearDown(self):
+        Parser.lexers.clear()
+        Parser.lexer_cache = self.lexer_cache
+        self.directory.cleanup()
+
+    def test_lexers_are_lazy(self):
+        # a program without lambdas never builds lambda_lexer
+        tokens = Parser.get_lexer().lex('(++ (1 (2 3) ) )')
+        self.assertEqual(Parser.evaluate(Parser.parse(tokens, AST())), '( 1 2 3 )')
+        self.assertEqual(sorted(Parser.lexers), ['lexer'])
+
+        tokens = Parser.get_lexer().lex('((lambda x: (+ x x)) (1 2))')
+        Parser.evaluate(Parser.parse(tokens, AST()))
+        self.assertEqual(sorted(Parser.lexers), ['lambda_lexer', 'lexer'])
+
+    def test_module_attributes(self):
+        self.assertIs(Parser.lambda_lexer, Parser.get_lexer('lambda_lexer'))
+        self.assertIs(Parser.lexer, Parser.get_lexer())
+        with self.assertRaises(AttributeError):
+            Parser.other_lexer
+
+    def test_threads_share_one_lexer(self):
+        results = []
+        threads = [Thread(target=lambda: results.append(Parser.get_lexer())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(lexer is results[0] for lexer in results))
@@ -0,0 +1,133 @@
+import unittest
+
+from src.Derivatives import Terms, derivative_dfa
+from src.Regex import parse_regex
+from src.RegToNfaUtils import CLASS, ESCAPE, LITERAL, OPERATOR, PAREN, process_regex, tokenize_regex
+
+
+class RegexTests(unittest.TestCase):
+    def behaviour_check(self, regex: str, tests) -> None:
+        nfa = parse_regex(regex).thompson()
+        dfa = nfa.subset_construction()
+        glushkov = parse_regex(regex).glushkov()
+        for word, ref in tests:
+            self.assertEqual(nfa.accept(word), ref, f'"{regex}" on "{word}"')
+            self.assertEqual(dfa.accept(word), ref, f'"{regex}" on "{word}"')
+            self.assertEqual(glushkov.accept(word), ref, f'glushkov "{regex}" on "{word}"')
+
+    def test_long_alternation(self):
+        # thousands of alternatives are built without recursion
+        words = [f'{chr(97 + i % 26)}{chr(97 + i // 26 % 26)}{chr(97 + i // 676)}' for i in range(3000)]
+        nfa = parse_regex('|'.join(words)).thompson()
+
+        # 2 states for each character and 2 for each union
+        self.assertEqual(len(nfa.K), 3000 * 3 * 2 + 2999 * 2)
+        self.assertEqual(sum(len(next_states) for next_states in nfa.d.values()), 3000 * 3 + 3000 * 2 + 2999 * 4)
+
+    def test_plus_of_plus(self):
+        self.behaviour_check('(ab+)+c', [('abc', True), ('abbabc', True), ('c', False), ('aabc', False)])
+
+    def test_character_classes(self):
+        self.behaviour_check('[a-zA-Z_][a-zA-Z_0-9]*', [
+            ('x', True), ('_tmp9', True), ('Camel_Case', True), ('9lives', False), ('a-b', False), ('', False),
+        ])
+        self.behaviour_check('[^0-9\\]]+', [('abc', True), ('a]', False), ('é€', True), ('a1', False)])
+        self.behaviour_check('a[^]b', [('a b', True), ('a\nb', True), ('ab', False)])
+        self.behaviour_check('[-+]1', [('-1', True), ('+1', True), ('1', False)])
+
+    def test_class_is_one_transition(self):
+        # a wide class does not add a transition for every character
+        nfa = parse_regex('[^a]').thompson()
+        self.assertEqual(len(nfa.d), 1)
+        self.assertEqual(len(nfa.subset_construction().S), 1)
+
+    def test_counted_repetition(self):
+        self.behaviour_check('a{3}', [('aaa', True), ('aa', False), ('aaaa', False)])
+        self.behaviour_check('(ab|c){1,3}d', [('abd', True), ('cabcd', True), ('d', False), ('ababcd', True), ('cccab', False), ('abababcd', False)])
+        self.behaviour_check('0x[0-9]{2,}', [('0x12', True), ('0x1234', True), ('0x1', False)])
+        self.behaviour_check('b(a*b){0,2}', [('b', True), ('bb', True), ('baabab', True), ('bbbb', False)])
+        self.behaviour_check('a{0}b', [('b', True), ('ab', False)])
+        # the operand can enter its start state again, the empty word must not be reachable from there
+        self.behaviour_check('((b+){2,3}){0,1}', [('', True), ('b', False), ('bb', True), ('bbbbb', True)])
+        # not a repetition, so the braces are characters
+        self.behaviour_check('a{2,1}', [('a{2,1}', True), ('aa', False)])
+
+    def test_repetition_stays_small(self):
+        # the copies are chained, so the dfa grows linearly with the maximum
+        dfa = parse_regex('[0-9]{1,18}').thompson().subset_construction().minimize()
+        self.assertEqual(len(dfa.F), 18)
+        self.assertEqual(len(dfa.K), 20)
+
+    def test_glushkov_positions(self):
+        # a state for every position and the initial state, and no epsilon transitions
+        nfa = parse_regex('(a|b)*ab[0-9]').glushkov()
+        self.assertEqual(nfa.K, set(range(6)))
+        self.assertNotIn('', {symbol for (_, symbol) in nfa.d})
+        self.assertEqual(nfa.d[(0, 'a')], {1, 3})
+        self.assertEqual(nfa.F, {5})
+
+    def test_derivatives(self):
+        dfa = derivative_dfa([parse_regex('(a|b)*abb'), parse_regex('a+'), parse_regex('[0-9]{2,3}')])
+        # the derivatives of (a|b)*abb alone give its minimal dfa
+        self.assertEqual(len(derivative_dfa([parse_regex('(a|b)*abb')]).K), 4)
+        self.assertEqual(dfa.subsets[dfa.q0], frozenset())
+        for word, rules in [('aa', {1}), ('abb', {0}), ('babb', {0}), ('a', {1}), ('12', {2}), ('1234', set())]:
+            state = dfa.q0
+            for symbol in word:
+                state = dfa.d[(state, dfa.alphabet.class_of(symbol))]
+            self.assertEqual(dfa.subsets[state], rules, word)
+
+    def test_long_derivative(self):
+        # a long chain of nullable concatenations is derived without recursion
+        terms = Terms()
+        term = terms.from_regex(parse_regex('(a?)' * 1100))
+        self.assertTrue(terms.nullable[terms.derivative(term, 'a')])
+        self.assertEqual(terms.derivative(term, 'b'), terms.empty)
+
+    def test_simplify(self):
+        self.assertEqual(parse_regex('(a|a)').simplify(), parse_regex('a'))
+        self.assertEqual(parse_regex('((a*)+)?*').simplify(), parse_regex('a*'))
+        self.assertEqual(parse_regex('a|[b-c]|d|a').simplify(), parse_regex('[a-d]'))
+        self.assertEqual(parse_regex('abc|abd|ab').simplify(), parse_regex('ab([c-d])?'))
+        self.assertEqual(parse_regex('(a|b){1}').simplify(), parse_regex('[a-b]'))
+        for regex, words in [('if|int|in|i', ['i', 'in', 'int', 'if', 'it', '']),
+                             ('(ab|a)*c|\\(|\\)', ['c', 'aabc', 'abac', '(', ')', 'ab']),
+                             ('([a-z]|[A-Z])+|[0-9]', ['abC', '1', 'a1', ''])]:
+            nfa = parse_regex(regex).thompson()
+            simplified = parse_regex(regex).simplify().thompson()
+            self.assertLessEqual(len(simplified.K), len(nfa.K))
+            for word in words:
+                self.assertEqual(simplified.accept(word), nfa.accept(word), f'"{regex}" on "{word}"')
+
+    def test_simplify_long_shared_prefix(self):
+        # the prefixes are factored without recursion
+        regex = parse_regex('x' * 1200 + 'b|' + 'x' * 1200 + 'c').simplify()
+        nfa = regex.thompson()
+        self.assertTrue(nfa.accept('x' * 1200 + 'c'))
+        self.assertFalse(nfa.accept('x' * 1199 + 'b'))
+        # the shared prefix is built only once
+        self.assertEqual(len(nfa.K), 1201 * 2)
+
+    def test_states_from_zero(self):
+        # every compilation numbers its own states, so the same regex always gives the same nfa
+        first = parse_regex('a(b|c)*').thompson()
+        second = parse_regex('a(b|c)*').thompson()
+
+        self.assertEqual(first.K, set(range(len(first.K))))
+        self.assertEqual(first, second)
+
+    def test_tokens(self):
+        self.assertEqual(tokenize_regex('a\\ [0-9]+(b|c)'), [
+            (LITERAL, 'a'), (OPERATOR, '&'), (ESCAPE, ' '), (OPERATOR, '&'), (CLASS, '[0-9]'),
+            (OPERATOR, '+'), (OPERATOR, '&'), (PAREN, '('), (LITERAL, 'b'), (OPERATOR, '|'),
+            (LITERAL, 'c'), (PAREN, ')'),
+        ])
+        self.assertEqual(tokenize_regex('[^\\]a-c]x['), [
+            (CLASS, '[^\\]a-c]'), (OPERATOR, '&'), (LITERAL, 'x'), (OPERATOR, '&'), (LITERAL, '['),
+        ])
+        # the '[' that are never closed are literals, and the regex is not searched again for each of them
+        self.assertEqual(tokenize_regex('[a' * 20000)[-3:], [(LITERAL, '['), (OPERATOR, '&'), (LITERAL, 'a')])
+        self.assertEqual(process_regex('a b|c*'), [
+            (LITERAL, 'a'), (LITERAL, 'b'), (OPERATOR, '&'), (LITERAL, 'c'), (OPERATOR, '*'),
+            (OPERATOR, '|'),
+        ])
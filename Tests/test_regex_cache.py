@@ -0,0 +1,63 @@
+import unittest
+
+from src.Lexer import Lexer
+from src.RegexCache import RegexCache, regex_cache
+
+
+class RegexCacheTests(unittest.TestCase):
+    def test_hits_and_misses(self):
+        cache = RegexCache()
+
+        first = cache.get('a(b|c)*')
+        second = cache.get('a(b|c)*')
+        cache.get('abc')
+
+        self.assertIs(first, second)
+        info = cache.info()
+        self.assertEqual((info.hits, info.misses, info.entries), (1, 2, 2))
+
+        cache.clear()
+        self.assertEqual(cache.info(), (0, 0, 0, 0, cache.max_size, 0))
+
+    def test_eviction(self):
+        # 'ab' has 3 states and 2 transitions once reduced, so only one of them fits
+        cache = RegexCache(max_size=8)
+
+        cache.get('ab')
+        cache.get('cd')
+        cache.get('ab')
+
+        info = cache.info()
+        self.assertEqual((info.hits, info.misses, info.evictions, info.entries), (0, 3, 2, 1))
+        self.assertLessEqual(info.size, 8)
+
+    def test_lexers_share_regexes(self):
+        spec = [('SPACE', '\\ '), ('WORD', '[a-z]+')]
+        Lexer(spec)
+        hits = regex_cache.info().hits
+
+        lexer = Lexer(spec)
+
+        self.assertEqual(regex_cache.info().hits, hits + 2)
+        self.assertEqual(lexer.lex('ab c'), [('WORD', 'ab'), ('SPACE', ' '), ('WORD', 'c')])
+
+    def test_workers(self):
+        # the nfas built by the worker processes are the same as the ones built here, and go in the cache
+        cache = RegexCache(parallel_rules=1)
+        regexes = ['a(b|c)*', '[0-9]+', 'a(b|c)*', 'x{2,3}', 'abc']
+        cache.get('abc')
+
+        nfas = cache.get_all(regexes, workers=2)
+
+        self.assertEqual(nfas, [RegexCache().get(regex) for regex in regexes])
+        info = cache.info()
+        self.assertEqual((info.hits, info.misses, info.entries), (1, 4, 4))
+        self.assertIs(cache.get('x{2,3}'), nfas[3])
+
+    def test_lexer_workers(self):
+        spec = [(f'KEYWORD{index}', f'k{index}') for index in range(20)] + [('ID', '[a-z0-9]+'), ('SPACE', '\\ ')]
+        regex_cache.clear()
+        lexer = Lexer(spec, workers=2)
+        self.assertEqual(lexer.lex('k1 k12 k123'), [('KEYWORD1', 'k1'), ('SPACE', ' '), ('KEYWORD12', 'k12'),
+                                                    ('SPACE', ' '), ('ID', 'k123')])
+        self.assertEqual(lexer.lex('k1 k12 k123'), Lexer(spec).lex('k1 k12 k123'))
@@ -0,0 +1,151 @@
+import os
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+from .Lexer import Lexer
+from .Parser import spec, lambda_spec
+from .RegexCache import build_nfa, regex_cache
+
+# the ways to build a lexer that are compared, as keyword arguments of Lexer
+ENGINES = {
+    'thompson': {},
+    'glushkov': {'construction': 'glushkov'},
+    'derivatives': {'engine': 'derivatives'},
+}
+
+# a spec with many keywords sharing prefixes, where the automata get bigger
+keywords_spec = [(f'KEYWORD{index}', f'{chr(97 + index % 26)}{chr(97 + index // 26 % 26)}key{index}')
+                 for index in range(200)] + [('ID', '[a-z]([a-z0-9])*'), ('SPACE', '\\ +')]
+
+SPECS = {
+    'spec': (spec, '(lambda x: (+ x 12) (1 2 3 4 abc)) ++ ()\n\t' * 2000),
+    'lambda_spec': (lambda_spec, '(lambda x: (+ x 12)) (1 2)\n' * 2000),
+    'keywords': (keywords_spec, ' '.join(f'aakey{index} idx{index}' for index in range(4000))),
+}
+
+
+def run(repeat: int = 5) -> None:
+    # for every spec and engine: the best build time (with an empty regex cache),
+    # the size of the table and the time to lex the sample input
+    for spec_name, (rules, sample) in SPECS.items():
+        print(f'{spec_name}: {len(rules)} rules, {len(sample)} characters')
+        reference = None
+        for engine_name, options in ENGINES.items():
+            build_time = float('inf')
+            for _ in range(repeat):
+                regex_cache.clear()
+                start = perf_counter()
+                lexer = Lexer(rules, **options)
+                build_time = min(build_time, perf_counter() - start)
+            start = perf_counter()
+            tokens = lexer.lex(sample)
+            lex_time = perf_counter() - start
+            if reference is None:
+                reference = tokens
+            same = 'same tokens' if tokens == reference else 'DIFFERENT tokens'
+            print(f'  {engine_name:12} build {build_time * 1000:8.2f} ms  '
+                  f'{len(lexer.table.table):5} rows  lex {lex_time * 1000:8.2f} ms  {same}')
+
+
+def scaling(repeat: int = 3) -> None:
+    # the build time of the keywords spec when the nfas of the rules are built by
+    # 1, 2, 4, ... worker processes, up to the number of cores (and at least 2).
+    # only the nfas of the rules are built by the workers, the determinization and the
+    # minimization of the whole spec are not, so the part that runs in parallel is small
+    # (around a sixth of the build) and the speedup is bounded by it. starting the pool
+    # costs more than that on a spec of this size, so more workers are usually slower;
+    # the pool is used here for every worker count, whatever the size of the spec
+    (rules, _) = SPECS['keywords']
+    counts = [1]
+    while counts[-1] < max(os.cpu_count() or 1, 2):
+        counts.append(counts[-1] * 2)
+    rules_time = build_time = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        for _, regex in rules:
+            build_nfa(regex)
+        rules_time = min(rules_time, perf_counter() - start)
+        regex_cache.clear()
+        start = perf_counter()
+        Lexer(rules)
+        build_time = min(build_time, perf_counter() - start)
+    print(f'scaling: keywords, {os.cpu_count()} cores, best of {repeat}, '
+          f'{rules_time / build_time:.0%} of the build can run in parallel')
+    parallel_rules = regex_cache.parallel_rules
+    regex_cache.parallel_rules = 1
+    try:
+        for workers in counts:
+            build_time = float('inf')
+            for _ in range(repeat):
+                regex_cache.clear()
+                start = perf_counter()
+                Lexer(rules, workers=workers)
+                build_time = min(build_time, perf_counter() - start)
+            print(f'  {workers:3} workers  build {build_time * 1000:8.2f} ms')
+    finally:
+        regex_cache.parallel_rules = parallel_rules
+
+
+def editing(repeat: int = 3) -> None:
+    # the time to replace one rule of the keywords spec and lex the sample, against
+    # building a new lexer for the edited spec, for the dfa and the lazy dfa. the edits
+    # keep the rows that do not reach the rule and the dfa engine does not minimize again,
+    # the regexes are in the regex cache for both
+    (rules, sample) = SPECS['keywords']
+    edited = [('KEYWORD0', 'aakey0|aakeyzero')] + rules[1:]
+    print(f'editing: keywords, one rule replaced, best of {repeat}')
+    for engine in ('dfa', 'lazy'):
+        lexer = Lexer(rules, engine=engine)
+        rebuild_time = edit_time = float('inf')
+        for _ in range(repeat):
+            start = perf_counter()
+            Lexer(edited, engine=engine).lex(sample)
+            rebuild_time = min(rebuild_time, perf_counter() - start)
+            start = perf_counter()
+            lexer.replace_rule('KEYWORD0', edited[0][1])
+            lexer.lex(sample)
+            edit_time = min(edit_time, perf_counter() - start)
+            lexer.replace_rule('KEYWORD0', rules[0][1])
+        print(f'  {engine:5} rebuild {rebuild_time * 1000:8.2f} ms  edit {edit_time * 1000:8.2f} ms')
+
+
+# what a fresh interpreter does before its first result: import the parser,
+# lex a program without lambdas, and run a program with lambdas
+STARTUP = {
+    'import': '',
+    'lex': 'Parser.get_lexer().lex("(+ (1 2 3) 44)")',
+    'lambda program': 'Parser.evaluate(Parser.parse(Parser.get_lexer().lex("((lambda x: (+ x x)) (1 2))"), AST()))',
+}
+
+
+def startup(repeat: int = 5) -> None:
+    # the best wall time of a new python process for every step of STARTUP, with a cold
+    # lexer cache (an empty directory every time) and with a warm one, and the lexers
+    # that the process had to build
+    package = __package__ or 'src'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print('startup: new interpreter, best of', repeat)
+    with tempfile.TemporaryDirectory() as warm:
+        for step, code in STARTUP.items():
+            script = (f'from {package} import Parser\nfrom {package}.AST import AST\n{code}\n'
+                      f'print(" ".join(sorted(Parser.lexers)) or "none")')
+            for cache in ('cold', 'warm'):
+                best = float('inf')
+                for _ in range(repeat):
+                    with tempfile.TemporaryDirectory() as cold:
+                        environment = dict(os.environ, LEXER_CACHE_DIR=cold if cache == 'cold' else warm)
+                        start = perf_counter()
+                        output = subprocess.run([sys.executable, '-c', script], cwd=root, env=environment,
+                                                capture_output=True, text=True, check=True).stdout
+                        best = min(best, perf_counter() - start)
+                built = output.split('\n')[-2]
+                print(f'  {step:15} {cache}  {best * 1000:8.2f} ms  lexers: {built}')
+
+
+if __name__ == '__main__':
+    run()
+    scaling()
+    editing()
+    startup()